@@ -0,0 +1,221 @@
+"""Headless batch runner: Monte Carlo replications of the KRL Jogja-Solo simulation.
+
+Usage:
+    python krl_batch.py --replications 200 --workers 8 --seed 42
+    python krl_batch.py --replications 200 --seed 42 --checkpoint-dir runs/   # rerun the same line to resume
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from krl_checkpoint import CheckpointError, load_checkpoint, run_options, run_with_checkpoints
+from krl_core import (
+    EVENT_ENGINE, ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS, TICK_ENGINE, RandomStreams, Simulation, minutes_to_time_str,
+)
+from krl_scenario import load_scenario
+
+PERCENTILES = (5, 50, 95)
+
+
+def summarize_replication(simulation, results):
+    """Reduce get_results() of one replication to per-train scalars (cheap to send between processes)"""
+    trains = {}
+    mean_occupancy = simulation.occupancy.mean_occupancy()
+    peak_occupancy = simulation.occupancy.peak_occupancy()
+    for train in simulation.trains:
+        trains[train.id] = {
+            "departure_time": train.departure_time,
+            "seat_probability": results["seat_probability"].get(train.id),
+            "seat_probability_yogya": results["seat_probability_yogya"].get(train.id),
+            "avg_waiting_time": results["avg_waiting_times"].get(train.id),
+            "mean_occupancy": mean_occupancy.get(train.id),
+            "peak_occupancy": peak_occupancy.get(train.id),
+        }
+    return {
+        "passengers_generated": results["passengers_generated"],
+        "passengers_completed": results["passengers_completed"],
+        "trains": trains,
+    }
+
+
+def run_replication(seed, engine=TICK_ENGINE, arrivals=ONLINE_ARRIVALS, schedule=None, common_random_numbers=False,
+                    bounded_memory=False, scenario=None, checkpoint_dir=None):
+    """Run one full-day replication with its own seed and return its summary
+
+    With checkpoint_dir the replication checkpoints every simulated hour to replication-<seed>.krlckpt
+    there and leaves its summary, with the run_options() it was run with, in replication-<seed>.json
+    when done. A later call with the same seed and options returns that summary or resumes from the
+    checkpoint; files from a run with other options raise CheckpointError.
+    """
+    rng = RandomStreams(seed, common_random_numbers=common_random_numbers)
+    simulation = Simulation(engine, arrivals=arrivals, rng=rng, schedule=schedule, bounded_memory=bounded_memory,
+                            scenario=scenario)
+    if checkpoint_dir is None:
+        results = simulation.run()
+        return summarize_replication(simulation, results)
+
+    base = os.path.join(checkpoint_dir, f"replication-{seed}")
+    options = run_options(simulation)
+    if os.path.exists(f"{base}.json"):
+        with open(f"{base}.json") as f:
+            done = json.load(f)
+        if done.get("options") != options:
+            raise CheckpointError(f"{base}.json holds a replication run with other options; use another checkpoint directory")
+        summary = done["summary"]
+        summary["trains"] = {int(train_id): train for train_id, train in summary["trains"].items()}
+        return summary
+    if os.path.exists(f"{base}.krlckpt"):
+        simulation = load_checkpoint(f"{base}.krlckpt")
+        if run_options(simulation) != options:
+            raise CheckpointError(f"{base}.krlckpt was written by a run with other options; use another checkpoint directory")
+    run_with_checkpoints(simulation, f"{base}.krlckpt")
+    summary = summarize_replication(simulation, simulation.get_results())
+    with open(f"{base}.json.tmp", "w") as f:
+        json.dump({"options": options, "summary": summary}, f)
+    os.replace(f"{base}.json.tmp", f"{base}.json")
+    os.remove(f"{base}.krlckpt")
+    return summary
+
+
+def describe(values):
+    """Mean and percentiles of a list of numbers, ignoring missing (None) values"""
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    summary = {"mean": float(np.mean(values)), "n": len(values)}
+    for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{q}"] = float(value)
+    return summary
+
+
+def aggregate_replications(summaries):
+    """Combine per-replication summaries into mean/percentile tables per train"""
+    train_ids = sorted({train_id for s in summaries for train_id in s["trains"]})
+    trains = {}
+    for train_id in train_ids:
+        per_train = [s["trains"][train_id] for s in summaries if train_id in s["trains"]]
+        trains[train_id] = {"departure_time": per_train[0]["departure_time"]}
+        for metric in ("seat_probability", "seat_probability_yogya", "avg_waiting_time",
+                       "mean_occupancy", "peak_occupancy"):
+            trains[train_id][metric] = describe([t[metric] for t in per_train])
+    return {
+        "replications": len(summaries),
+        "passengers_generated": describe([s["passengers_generated"] for s in summaries]),
+        "passengers_completed": describe([s["passengers_completed"] for s in summaries]),
+        "trains": trains,
+    }
+
+
+def replication_seeds(n_replications, seed=None):
+    """Independent per-replication seeds derived from a single root seed"""
+    seed_sequence = np.random.SeedSequence(seed)
+    seeds = [int(child.generate_state(1)[0]) for child in seed_sequence.spawn(n_replications)]
+    return seed_sequence.entropy, seeds
+
+
+def run_replications(n_replications, workers=None, seed=None, engine=TICK_ENGINE, arrivals=ONLINE_ARRIVALS,
+                     schedule=None, common_random_numbers=False, bounded_memory=False, scenario=None,
+                     checkpoint_dir=None):
+    """Run n independent full-day replications in a process pool and aggregate the results
+
+    Replication i always gets the same seed for a given root seed, so two schedules run with the same
+    seed and common_random_numbers=True are compared on identical passenger streams. With
+    checkpoint_dir (and a fixed seed) an interrupted batch picks up where it stopped, see run_replication.
+    """
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    root_seed, seeds = replication_seeds(n_replications, seed)
+    workers = workers or os.cpu_count() or 1
+    replicate = partial(run_replication, engine=engine, arrivals=arrivals, schedule=schedule,
+                        common_random_numbers=common_random_numbers, bounded_memory=bounded_memory,
+                        scenario=scenario, checkpoint_dir=checkpoint_dir)
+
+    if workers == 1:
+        summaries = [replicate(s) for s in seeds]
+    else:
+        chunksize = max(1, n_replications // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            summaries = list(pool.map(replicate, seeds, chunksize=chunksize))
+
+    aggregate = aggregate_replications(summaries)
+    aggregate["seed"] = root_seed
+    aggregate["engine"] = engine
+    aggregate["arrivals"] = arrivals
+    if scenario is not None:
+        aggregate["scenario"] = scenario.name
+    return aggregate
+
+
+def format_summary(aggregate):
+    """Human readable table of the aggregated results"""
+    def fmt(summary, scale=1.0, unit=""):
+        if summary is None:
+            return "-"
+        return f"{summary['mean'] * scale:6.1f}{unit} [{summary['p5'] * scale:.1f}-{summary['p95'] * scale:.1f}]"
+
+    lines = [
+        f"Replikasi: {aggregate['replications']} (seed {aggregate['seed']}, engine {aggregate['engine']}, arrivals {aggregate['arrivals']}"
+        f"{', skenario ' + str(aggregate['scenario']) if 'scenario' in aggregate else ''})",
+        f"Penumpang per hari: {aggregate['passengers_generated']['mean']:.0f} "
+        f"(selesai {aggregate['passengers_completed']['mean']:.0f})",
+        "",
+        f"{'KRL':>4} {'Berangkat':>9}  {'Peluang duduk (%)':<24}{'Waktu tunggu (menit)':<24}{'Okupansi (%)':<24}",
+    ]
+    for train_id, train in aggregate["trains"].items():
+        lines.append(
+            f"{train_id + 1:>4} {minutes_to_time_str(train['departure_time']):>9}  "
+            f"{fmt(train['seat_probability'], 100):<24}"
+            f"{fmt(train['avg_waiting_time']):<24}"
+            f"{fmt(train['mean_occupancy']):<24}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless Monte Carlo replications of the KRL simulation")
+    parser.add_argument("-n", "--replications", type=int, default=100, help="number of full-day replications")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=None, help="root seed for reproducible batches")
+    parser.add_argument("--engine", choices=(TICK_ENGINE, EVENT_ENGINE), default=TICK_ENGINE,
+                        help="minute-tick or discrete-event engine (default: tick)")
+    parser.add_argument("--arrivals", choices=(ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS), default=ONLINE_ARRIVALS,
+                        help="draw arrivals minute by minute or sample the whole day up front (default: online)")
+    parser.add_argument("--bounded-memory", action="store_true",
+                        help="fold finished passengers into aggregates instead of keeping them (same results)")
+    parser.add_argument("--scenario", metavar="PATH", help="scenario file (.json/.toml, see krl_scenario.py)")
+    parser.add_argument("--checkpoint-dir", metavar="DIR",
+                        help="checkpoint replications hourly in DIR; rerunning with the same --seed resumes the batch")
+    parser.add_argument("--json", metavar="PATH", help="also write the aggregated results as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+    if args.replications < 1:
+        parser.error("--replications must be at least 1")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.checkpoint_dir and args.seed is None:
+        parser.error("--checkpoint-dir needs --seed, otherwise a rerun gets other replications")
+
+    scenario = load_scenario(args.scenario) if args.scenario else None
+    try:
+        aggregate = run_replications(args.replications, workers=args.workers, seed=args.seed,
+                                     engine=args.engine, arrivals=args.arrivals, bounded_memory=args.bounded_memory,
+                                     scenario=scenario, checkpoint_dir=args.checkpoint_dir)
+    except CheckpointError as e:
+        sys.exit(f"Error: {e}")
+
+    if args.json == "-":
+        json.dump(aggregate, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_summary(aggregate))
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(aggregate, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Benchmark suite for the simulation core: full-day runs, hot functions, get_results() and import time.
+
+Sweeps a demand multiplier on PASSENGER_RATES, the number of trains and the number of stations
+(one axis at a time from the base network) and saves the timings as a JSON baseline that later
+runs can be compared against. Importing krl_core in a fresh interpreter must stay within
+CORE_IMPORT_BUDGET_S and must not load pygame or matplotlib, so pool workers start cheaply.
+
+Usage:
+    python krl_benchmark.py --save baseline.json
+    python krl_benchmark.py --compare baseline.json
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+import krl_core
+from krl_core import (
+    EVENT_ENGINE, ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS, TICK_ENGINE, TRAIN_CAPACITY, TRAIN_SCHEDULE,
+    Simulation, Train,
+)
+
+BASELINE_VERSION = 1
+DEMAND_MULTIPLIERS = (1, 5, 20)
+TRAIN_COUNTS = (15, 30, 60)
+STATION_COUNTS = (6, 12, 24)
+EXTRA_STATION_DESTINATION_WEIGHT = 0.02  # Destination weight of each added station, from every origin before it
+CORE_IMPORT_BUDGET_S = 0.25  # ~0.09 s measured, most of it NumPy
+UI_MODULES = ("pygame", "matplotlib")  # Must not be imported by krl_core
+
+# Run in a fresh interpreter: import time of krl_core and the UI modules it pulled in
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import krl_core
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_s": elapsed, "loaded": [name for name in %r if name in sys.modules]}))
+""" % (UI_MODULES,)
+
+# Hot functions timed inside the full-day run: (label, class, method name)
+HOT_FUNCTIONS = [
+    ("Simulation.update", Simulation, "update"),
+    ("Train.board_passengers", Train, "board_passengers"),
+    ("Train._alight_passengers_at_current_station", Train, "_alight_passengers_at_current_station"),
+]
+
+
+@contextmanager
+def scaled_network(demand=1.0, n_stations=None):
+    """Temporarily scale PASSENGER_RATES and add intermediate stations to the line
+
+    Added stations are spread evenly between the two termini, get the passenger rates of Maguwo
+    and a small fixed destination weight; the original stations and their data are kept.
+    """
+    names = ("STATIONS", "STATION_INDEX", "PASSENGER_RATES", "DESTINATION_PROBS")
+    saved = {name: getattr(krl_core, name) for name in names}
+    stations = list(saved["STATIONS"])
+    rates = copy.deepcopy(saved["PASSENGER_RATES"])
+    destinations = copy.deepcopy(saved["DESTINATION_PROBS"])
+
+    extra = max(0, (n_stations or len(stations)) - len(stations))
+    length = stations[-1][1] - stations[0][1]
+    for k in range(extra):
+        name = f"X{k + 1}"
+        stations.append((name, stations[0][1] + length * (k + 0.5) / extra))
+        for hourly in rates.values():
+            hourly[name] = hourly.get("MGW", 0)
+    stations.sort(key=lambda station: station[1])
+    station_index = {name: idx for idx, (name, _) in enumerate(stations)}
+    for origin_idx, (origin, _) in enumerate(stations):
+        destinations.setdefault(origin, {})
+        if origin_idx < len(stations) - 1:
+            for destination, _ in stations[origin_idx + 1:]:
+                if destination.startswith("X"):
+                    destinations[origin][destination] = EXTRA_STATION_DESTINATION_WEIGHT
+    for hourly in rates.values():
+        for name in hourly:
+            hourly[name] *= demand
+
+    for name, value in zip(names, (stations, station_index, rates, destinations)):
+        setattr(krl_core, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(krl_core, name, value)
+
+
+def spread_schedule(n_trains):
+    """n trains evenly spaced between the first and last departure of TRAIN_SCHEDULE"""
+    if n_trains == len(TRAIN_SCHEDULE):
+        return list(TRAIN_SCHEDULE)
+    first, last = TRAIN_SCHEDULE[0][0], TRAIN_SCHEDULE[-1][0]
+    return [(int(d), TRAIN_CAPACITY) for d in np.linspace(first, last, n_trains).round()]
+
+
+@contextmanager
+def timed_methods(functions):
+    """Wrap methods to accumulate their wall time and call count (adds ~0.2 us per call)"""
+    timings = {label: {"calls": 0, "total_s": 0.0} for label, _, _ in functions}
+    originals = [(cls, name, cls.__dict__[name]) for _, cls, name in functions]
+
+    def wrap(method, timing):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timing["total_s"] += time.perf_counter() - start
+                timing["calls"] += 1
+        return timed
+
+    for (label, cls, name), (_, _, method) in zip(functions, originals):
+        setattr(cls, name, wrap(method, timings[label]))
+    try:
+        yield timings
+    finally:
+        for cls, name, method in originals:
+            setattr(cls, name, method)
+
+
+def run_case(demand=1, n_stations=6, n_trains=15, engine=TICK_ENGINE, arrivals=ONLINE_ARRIVALS, seed=0, repeat=3):
+    """Best-of-repeat timings of one configuration"""
+    best = None
+    with scaled_network(demand, n_stations):
+        schedule = spread_schedule(n_trains)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            simulation = Simulation(engine, arrivals=arrivals, rng=seed, schedule=schedule)
+            setup_s = time.perf_counter() - start
+            start = time.perf_counter()
+            simulation.run()
+            full_day_s = time.perf_counter() - start
+
+            simulation.results_cache = None  # Time the uncached grouping pass
+            start = time.perf_counter()
+            simulation.get_results()
+            get_results_s = time.perf_counter() - start
+
+            if best is None or full_day_s < best["full_day_s"]:
+                best = {"setup_s": setup_s, "full_day_s": full_day_s, "get_results_s": get_results_s,
+                        "passengers": len(simulation.passengers)}
+
+        # Hot functions and phases in a separate, instrumented run so the wrappers don't distort full_day_s
+        simulation = Simulation(engine, arrivals=arrivals, rng=seed, schedule=schedule, profile=True)
+        with timed_methods(HOT_FUNCTIONS) as timings:
+            simulation.run()
+    for timing in timings.values():
+        timing["per_call_us"] = 1e6 * timing["total_s"] / timing["calls"] if timing["calls"] else None
+    best["functions"] = timings
+    best["phases"] = simulation.profiler.report()["phases"]
+    return best
+
+
+def measure_core_import(repeat=5):
+    """Best-of-repeat wall time of `import krl_core` in fresh interpreters, and any UI modules it loaded"""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        probe = json.loads(output)
+        if best is None or probe["import_s"] < best["import_s"]:
+            best = probe
+    return best
+
+
+def benchmark_cases(demands=DEMAND_MULTIPLIERS, train_counts=TRAIN_COUNTS, station_counts=STATION_COUNTS):
+    """Configurations sweeping one axis at a time from the base network"""
+    base = {"demand": 1, "n_stations": len(krl_core.STATIONS), "n_trains": len(TRAIN_SCHEDULE)}
+    cases = {}
+    for axis, values in (("demand", demands), ("n_trains", train_counts), ("n_stations", station_counts)):
+        for value in values:
+            case = dict(base, **{axis: value})
+            cases[f"demand={case['demand']:g}x,trains={case['n_trains']},stations={case['n_stations']}"] = case
+    return cases
+
+
+def run_benchmarks(cases, engine=TICK_ENGINE, arrivals=ONLINE_ARRIVALS, seed=0, repeat=3, progress=None):
+    results = {}
+    for name, case in cases.items():
+        results[name] = dict(case, **run_case(engine=engine, arrivals=arrivals, seed=seed, repeat=repeat, **case))
+        if progress:
+            progress(name, results[name])
+    return {
+        "version": BASELINE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "engine": engine,
+        "arrivals": arrivals,
+        "seed": seed,
+        "repeat": repeat,
+        "core_import": measure_core_import(),
+        "cases": results,
+    }
+
+
+def case_metrics(case):
+    """Timings compared between runs: name -> seconds (per call for the hot functions)"""
+    metrics = {"full_day_s": case["full_day_s"], "get_results_s": case["get_results_s"]}
+    for label, timing in case["functions"].items():
+        if timing["per_call_us"] is not None:
+            metrics[label] = timing["per_call_us"] / 1e6
+    return metrics
+
+
+def compare(current, baseline, tolerance=0.10):
+    """Lines comparing two benchmark results and the number of timings slower than baseline by more than tolerance"""
+    lines = []
+    regressions = 0
+    if "core_import" in current and "core_import" in baseline:
+        old, new = baseline["core_import"]["import_s"], current["core_import"]["import_s"]
+        flag = "  <-- lebih lambat" if new > old * (1 + tolerance) else ""
+        regressions += bool(flag)
+        lines.append(f"import krl_core {old * 1e3:10.3f} ms -> {new * 1e3:10.3f} ms  x{new / old:.2f}{flag}")
+    for name, case in current["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        old_metrics = case_metrics(baseline["cases"][name])
+        lines.append(name)
+        for metric, new in case_metrics(case).items():
+            old = old_metrics.get(metric)
+            if not old:
+                continue
+            ratio = new / old
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag = "  <-- lebih lambat"
+                regressions += 1
+            elif ratio < 1 - tolerance:
+                flag = "  (lebih cepat)"
+            lines.append(f"  {metric:<45} {old * 1e3:10.3f} ms -> {new * 1e3:10.3f} ms  x{ratio:.2f}{flag}")
+    return lines, regressions
+
+
+def format_case(name, case):
+    functions = ", ".join(f"{label.split('.')[-1]} {timing['per_call_us']:.1f}us x{timing['calls']}"
+                          for label, timing in case["functions"].items() if timing["calls"])
+    return (f"{name}: {case['full_day_s']:.3f}s/hari, get_results {case['get_results_s'] * 1e3:.1f}ms, "
+            f"{case['passengers']} penumpang; {functions}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation core headless")
+    parser.add_argument("--engine", choices=(TICK_ENGINE, EVENT_ENGINE), default=TICK_ENGINE)
+    parser.add_argument("--arrivals", choices=(ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS), default=ONLINE_ARRIVALS)
+    parser.add_argument("--demand", type=float, nargs="+", default=DEMAND_MULTIPLIERS, help="demand multipliers")
+    parser.add_argument("--trains", type=int, nargs="+", default=TRAIN_COUNTS, help="train counts")
+    parser.add_argument("--stations", type=int, nargs="+", default=STATION_COUNTS, help="station counts")
+    parser.add_argument("--repeat", type=int, default=3, help="full-day runs per case (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging (default 10%%)")
+    parser.add_argument("--import-budget", type=float, default=CORE_IMPORT_BUDGET_S,
+                        help="maximum seconds for importing krl_core (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    cases = benchmark_cases(args.demand, args.trains, args.stations)
+    results = run_benchmarks(cases, engine=args.engine, arrivals=args.arrivals, seed=args.seed, repeat=args.repeat,
+                             progress=lambda name, case: print(format_case(name, case)))
+
+    core_import = results["core_import"]
+    print(f"import krl_core: {core_import['import_s'] * 1e3:.1f} ms (anggaran {args.import_budget * 1e3:.0f} ms)")
+    over_budget = core_import["import_s"] > args.import_budget or core_import["loaded"]
+    if core_import["loaded"]:
+        print(f"krl_core memuat modul UI: {', '.join(core_import['loaded'])}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.tolerance)
+        print()
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{regressions} pengukuran lebih lambat dari baseline (toleransi {args.tolerance:.0%})")
+            sys.exit(1)
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Checkpoints: the full engine state of a simulation day in a compact, versioned binary file.
+
+A checkpoint holds the run configuration (engine, arrivals, seed, schedule, rates, scenario) and
+Simulation.capture_state(), RNG bit-generator states included, so a run interrupted at any minute
+resumes from its last checkpoint and ends with bit-identical results.
+
+File layout (little-endian):
+
+    magic "KRLCKP" | uint16 format version | uint16 flags | uint32 manifest length
+    manifest: UTF-8 JSON with the config and the state, arrays replaced by {"@array": index}
+    payload: the raw bytes of those arrays, back to back (zlib-compressed if flags & 1)
+
+Usage:
+    python krl_checkpoint.py run.krlckpt --seed 42 --stop-at 12:00   # run until noon, checkpoint every hour
+    python krl_checkpoint.py run.krlckpt --resume                     # carry on from the last checkpoint
+    python krl_checkpoint.py run.krlckpt --info
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from krl_core import (
+    EVENT_ENGINE, GIVE_UP_EVENT, ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS, STATION_INDEX, STATIONS, TICK_ENGINE,
+    RandomStreams, Simulation, minutes_to_time_str,
+)
+from krl_scenario import Scenario, ScenarioError, load_scenario, parse_departure
+
+CHECKPOINT_MAGIC = b"KRLCKP"
+CHECKPOINT_VERSION = 3  # Bump when the manifest or state layout changes; other versions are refused
+CHECKPOINT_HEADER = struct.Struct("<6sHHI")
+COMPRESSED = 1  # Header flag: payload is zlib-compressed
+CHECKPOINT_INTERVAL = 60  # Simulated minutes between checkpoints in run_with_checkpoints
+
+
+class CheckpointError(ValueError):
+    """A file that is not a checkpoint, or one written in another format version"""
+
+
+def checkpoint_config(simulation):
+    """Everything besides capture_state() needed to set the simulation up again"""
+    scenario = simulation.scenario
+    return {
+        "engine": simulation.engine,
+        "arrivals": simulation.arrivals,
+        "bounded_memory": simulation.bounded_memory,
+        "debug": simulation.debug,
+        "seed": simulation.rng.seed,
+        "common_random_numbers": simulation.rng.common_random_numbers,
+        "day": simulation.day,
+        "schedule": [[int(departure), int(capacity)] for departure, capacity in simulation.schedule],
+        "rates": simulation.rates,
+        # The compiled arrays themselves: recompiling the file could change the probabilities in the last bit
+        "scenario": None if scenario is None else {
+            "name": scenario.name, "station_codes": scenario.station_codes, "distances": scenario.distances,
+            "rates": scenario.rates, "destinations": scenario.destinations, "departures": scenario.departures,
+            "capacities": scenario.capacities, "seated_capacity": scenario.seated_capacity,
+            "digest": scenario.digest,
+        },
+    }
+
+
+def run_options(simulation):
+    """What decides the results of a run, as JSON-compatible values to compare runs and checkpoints with ==
+
+    checkpoint_config() without debug, with the rates as nested lists and the scenario as a SHA-256 of
+    its compiled arrays (None without a scenario).
+    """
+    options = checkpoint_config(simulation)
+    del options["debug"]
+    options["rates"] = options["rates"].tolist()
+    if options["scenario"] is not None:
+        scenario = json.dumps(options["scenario"], sort_keys=True, default=lambda value: value.tolist())
+        options["scenario"] = hashlib.sha256(scenario.encode()).hexdigest()
+    return options
+
+
+def simulation_from_config(config, **options):
+    """A Simulation at the start of the checkpointed day; options are the ones a checkpoint doesn't hold
+    (profile, occupancy_directory, event_log)"""
+    scenario = None if config["scenario"] is None else Scenario(**config["scenario"])
+    schedule = [tuple(entry) for entry in config["schedule"]]
+    simulation = Simulation(config["engine"], debug=config["debug"], arrivals=config["arrivals"],
+                            rng=RandomStreams(config["seed"], config["common_random_numbers"]), schedule=schedule,
+                            bounded_memory=config["bounded_memory"], rates=config["rates"], scenario=scenario,
+                            **options)
+    if config["day"] != simulation.day:
+        simulation.start_day(config["day"], schedule, config["rates"])
+    return simulation
+
+
+def pack_events(events):
+    """Event heap entries as columns; times keep whether they were ints, so resumed runs see the same values"""
+    times = [entry[0] for entry in events]
+    payloads = [entry[3] for entry in events]
+    payload_times = [payload[1] if kind == GIVE_UP_EVENT else 0 for (_, kind, _, _), payload in zip(events, payloads)]
+    return {
+        "time": np.array(times, dtype=np.float64),
+        "time_is_int": np.array([isinstance(time, int) for time in times], dtype=bool),
+        "kind": np.array([entry[1] for entry in events], dtype=np.uint8),
+        "order": np.array([entry[2] for entry in events], dtype=np.int64),
+        # Train id or -1 (arrival batch); give-ups store their station and arrival time cut-off
+        "payload": np.array([STATION_INDEX[payload[0]] if kind == GIVE_UP_EVENT else -1 if payload is None else payload
+                             for (_, kind, _, _), payload in zip(events, payloads)], dtype=np.int64),
+        "payload_time": np.array(payload_times, dtype=np.float64),
+        "payload_time_is_int": np.array([isinstance(time, int) for time in payload_times], dtype=bool),
+    }
+
+
+def unpack_events(columns):
+    def values(name):
+        return [int(value) if is_int else value for value, is_int in
+                zip(columns[name].tolist(), columns[f"{name}_is_int"].tolist())]
+
+    events = []
+    for time, kind, order, payload, payload_time in zip(values("time"), columns["kind"].tolist(),
+                                                        columns["order"].tolist(), columns["payload"].tolist(),
+                                                        values("payload_time")):
+        if kind == GIVE_UP_EVENT:
+            payload = (STATIONS[payload][0], payload_time)
+        elif payload < 0:
+            payload = None
+        events.append((time, kind, order, payload))
+    return events
+
+
+def pack_state(state):
+    """capture_state() with its int-keyed dicts and event tuples turned into arrays"""
+    state = dict(state)
+    waiting_times = state["waiting_times"]
+    if waiting_times is not None:
+        state["waiting_times"] = {
+            "trains": np.array(list(waiting_times), dtype=np.int64),
+            "lengths": np.array([len(times) for times in waiting_times.values()], dtype=np.int64),
+            "times": np.concatenate([np.zeros(0)] + list(waiting_times.values())),
+        }
+    if "events" in state:
+        state["events"] = pack_events(state["events"])
+        next_sample_time = state["next_sample_time"]
+        state["next_sample_time"] = {"trains": np.array(list(next_sample_time), dtype=np.int64),
+                                     "minutes": np.array(list(next_sample_time.values()), dtype=np.int64)}
+    return state
+
+
+def unpack_state(state):
+    waiting_times = state["waiting_times"]
+    if waiting_times is not None:
+        ends = np.cumsum(waiting_times["lengths"])
+        state["waiting_times"] = {train_id: times for train_id, times in zip(
+            waiting_times["trains"].tolist(), np.split(waiting_times["times"], ends[:-1]))}
+    if "events" in state:
+        state["events"] = unpack_events(state["events"])
+        next_sample_time = state["next_sample_time"]
+        state["next_sample_time"] = dict(zip(next_sample_time["trains"].tolist(), next_sample_time["minutes"].tolist()))
+    return state
+
+
+def encode_manifest(value, arrays):
+    """JSON-compatible copy of value with every array appended to `arrays` and replaced by a reference"""
+    if isinstance(value, np.ndarray):
+        arrays.append(np.ascontiguousarray(value, dtype=value.dtype.newbyteorder("<")))
+        return {"@array": len(arrays) - 1}
+    if isinstance(value, dict):
+        return {key: encode_manifest(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_manifest(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def decode_manifest(value, arrays):
+    if isinstance(value, dict):
+        if "@array" in value:
+            return arrays[value["@array"]]
+        return {key: decode_manifest(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_manifest(item, arrays) for item in value]
+    return value
+
+
+def write_checkpoint(simulation, path, compress=True):
+    """Write a checkpoint of the simulation (between two updates); returns its size in bytes
+
+    The file is written next to `path` and then renamed over it, so an interruption while writing
+    leaves the previous checkpoint intact.
+    """
+    arrays = []
+    manifest = encode_manifest({"config": checkpoint_config(simulation), "state": pack_state(simulation.capture_state())},
+                               arrays)
+    manifest["arrays"] = [[array.dtype.str, list(array.shape)] for array in arrays]
+    manifest = json.dumps(manifest, separators=(",", ":")).encode()
+    payload = b"".join(array.tobytes() for array in arrays)
+    if compress:
+        payload = zlib.compress(payload, 1)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, COMPRESSED if compress else 0,
+                                       len(manifest)))
+        f.write(manifest)
+        f.write(payload)
+    os.replace(temporary, path)
+    return CHECKPOINT_HEADER.size + len(manifest) + len(payload)
+
+
+def read_checkpoint(path):
+    """(config, state) of a checkpoint file, see simulation_from_config and Simulation.restore_state"""
+    with open(path, "rb") as f:
+        header = f.read(CHECKPOINT_HEADER.size)
+        if len(header) < CHECKPOINT_HEADER.size or header[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+            raise CheckpointError(f"{path} is not a KRL checkpoint")
+        _, version, flags, manifest_size = CHECKPOINT_HEADER.unpack(header)
+        if version != CHECKPOINT_VERSION:
+            raise CheckpointError(f"{path} is checkpoint format version {version}, "
+                                  f"this version reads version {CHECKPOINT_VERSION}")
+        manifest = json.loads(f.read(manifest_size))
+        payload = f.read()
+    if flags & COMPRESSED:
+        payload = zlib.decompress(payload)
+    arrays = []
+    offset = 0
+    for dtype, shape in manifest["arrays"]:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        arrays.append(np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(shape))
+        offset += count * dtype.itemsize
+    return decode_manifest(manifest["config"], arrays), unpack_state(decode_manifest(manifest["state"], arrays))
+
+
+def load_checkpoint(path, **options):
+    """Simulation resumed from a checkpoint file, at the minute it was written"""
+    config, state = read_checkpoint(path)
+    simulation = simulation_from_config(config, **options)
+    simulation.restore_state(state)
+    return simulation
+
+
+def run_with_checkpoints(simulation, path, every=CHECKPOINT_INTERVAL, stop_at=None, compress=True):
+    """Run the day, writing a checkpoint at every `every`-th simulated minute, at stop_at and at the end
+
+    Returns True if the day is complete, False if it stopped at stop_at.
+    """
+    while not simulation.is_complete():
+        if stop_at is not None and simulation.current_time >= stop_at:
+            write_checkpoint(simulation, path, compress)
+            return False
+        if simulation.current_time % every == 0:
+            write_checkpoint(simulation, path, compress)
+        simulation.update()
+    write_checkpoint(simulation, path, compress)
+    return True
+
+
+def summarize_run(simulation):
+    """Totals of the run so far, as written by --json"""
+    results = simulation.get_results()
+    tables = simulation.result_tables()
+    return {
+        "time": simulation.current_time,
+        "complete": simulation.is_complete(),
+        "passengers_generated": results["passengers_generated"],
+        "passengers_completed": results["passengers_completed"],
+        "passengers_gave_up": results["passengers_gave_up"],
+        "seat_probability": tables.overall_seat_probability(),
+        "avg_waiting_time": tables.overall_avg_waiting_time(),
+    }
+
+
+def format_run(summary):
+    seat = summary["seat_probability"]
+    wait = summary["avg_waiting_time"]
+    return (f"{'Selesai' if summary['complete'] else 'Berhenti'} pada {minutes_to_time_str(summary['time'])}: "
+            f"{summary['passengers_generated']} penumpang, selesai {summary['passengers_completed']}, "
+            f"menyerah {summary['passengers_gave_up']}, "
+            f"peluang duduk {'-' if seat is None else f'{seat * 100:.1f}%'}, "
+            f"tunggu {'-' if wait is None else f'{wait:.1f} menit'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a KRL simulation day with checkpoints, or resume one")
+    parser.add_argument("checkpoint", help="checkpoint file, rewritten every --every simulated minutes")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint instead of starting over")
+    parser.add_argument("--info", action="store_true", help="only describe the checkpoint")
+    parser.add_argument("--every", type=int, default=CHECKPOINT_INTERVAL, help="simulated minutes between checkpoints")
+    parser.add_argument("--stop-at", metavar="HH:MM", help="stop (after writing a checkpoint) at this simulated time")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--engine", choices=(TICK_ENGINE, EVENT_ENGINE), default=TICK_ENGINE)
+    parser.add_argument("--arrivals", choices=(ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS), default=ONLINE_ARRIVALS)
+    parser.add_argument("--crn", action="store_true", help="common random numbers")
+    parser.add_argument("--bounded-memory", action="store_true", help="fold finished passengers into aggregates")
+    parser.add_argument("--scenario", metavar="PATH", help="scenario file (.json/.toml, see krl_scenario.py)")
+    parser.add_argument("--no-compress", action="store_true", help="write the arrays uncompressed (faster, larger)")
+    parser.add_argument("--json", metavar="PATH", help="write the run summary as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        stop_at = None if args.stop_at is None else parse_departure(args.stop_at, "--stop-at")
+        if args.info:
+            config, state = read_checkpoint(args.checkpoint)
+            print(f"{args.checkpoint}: versi {CHECKPOINT_VERSION}, {os.path.getsize(args.checkpoint)} byte, "
+                  f"hari {config['day']}, waktu {minutes_to_time_str(state['current_time'])}, "
+                  f"engine {config['engine']}, arrivals {config['arrivals']}, seed {config['seed']}"
+                  f"{', skenario ' + config['scenario']['name'] if config['scenario'] else ''}")
+            return
+        if args.resume:
+            simulation = load_checkpoint(args.checkpoint)
+        else:
+            scenario = load_scenario(args.scenario) if args.scenario else None
+            simulation = Simulation(args.engine, arrivals=args.arrivals, rng=RandomStreams(args.seed, args.crn),
+                                    bounded_memory=args.bounded_memory, scenario=scenario)
+    except (OSError, ScenarioError, CheckpointError) as e:
+        sys.exit(f"Error: {e}")
+
+    run_with_checkpoints(simulation, args.checkpoint, args.every, stop_at, compress=not args.no_compress)
+    summary = summarize_run(simulation)
+    if args.json == "-":
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_run(summary))
+        print(f"Checkpoint: {args.checkpoint} (seed {simulation.rng.seed})")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
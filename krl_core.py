@@ -0,0 +1,1927 @@
+"""Simulation core of the KRL Jogja-Solo commuter line: passengers, trains, engines and results.
+
+Imports only NumPy, so headless tools and pool workers don't pay for pygame (SDL) or matplotlib;
+the pygame app lives in krl_simulation.py and the result charts in krl_plots.py.
+"""
+import bisect
+import heapq
+import itertools
+import math
+import json
+import numpy as np
+from collections import defaultdict, deque
+from time import perf_counter
+
+# Public names: what krl_simulation re-exports with its star import (not the modules imported above)
+__all__ = [
+    "LAST_TRAIN_BUFFER", "SIMULATION_SPEED", "MAX_SIMULATION_TIME", "PASSENGER_GIVE_UP_WAIT_TIME",
+    "UPCOMING_TRAIN_CHECK_WINDOW", "SNAPSHOT_INTERVAL", "SNAPSHOT_KEYFRAME_EVERY", "TICK_ENGINE", "EVENT_ENGINE",
+    "PASSENGER_ARRIVAL_EVENT", "TRAIN_DEPARTURE_EVENT", "TRAIN_ARRIVAL_EVENT", "GIVE_UP_EVENT", "ONLINE_ARRIVALS",
+    "PRESAMPLED_ARRIVALS", "GENERATION_PHASE", "TRAINS_PHASE", "GIVE_UP_PHASE", "STATS_CHECK_PHASE",
+    "OCCUPANCY_PHASE", "EVENT_PHASES", "STATIONS", "STATION_INDEX", "TRAIN_SCHEDULE", "PASSENGER_RATES",
+    "WEEKDAY", "WEEKEND", "HOLIDAY", "DAY_TYPE_DEMAND", "DESTINATION_PROBS", "TRAIN_CAPACITY", "SEATED_CAPACITY",
+    "TRAIN_SPEED", "BOARDING_TIME", "DWELL_TIME", "train_stop_times", "minutes_to_time_str", "passenger_rate_matrix", "day_type_rates",
+    "week_calendar", "run_days", "destination_matrix", "WAITING_TIME_TICKS", "WAITING_TIME_BINS", "WAITING", "SEATED", "COMPLETED",
+    "RETIRED", "PassengerStore", "Passenger", "RandomStreams", "ArrivalStream", "Timetable", "ARRIVAL_LOG_EVENT",
+    "BOARD_LOG_EVENT", "SEAT_GAINED_LOG_EVENT", "ALIGHT_LOG_EVENT", "GIVE_UP_LOG_EVENT", "LOG_EVENT_NAMES",
+    "EVENT_LOG_MAGIC", "EVENT_RECORD_DTYPE", "log_event_dict", "EventSink", "JsonlEventSink", "BinaryEventSink",
+    "open_event_log", "read_event_chunks", "read_event_log", "Train", "ResultTables", "OccupancySeries",
+    "Profiler", "ArrayDelta", "ContainerDelta", "encode_delta", "apply_delta", "state_nbytes", "StateTimeline",
+    "Simulation"
+]
+
+# Constants
+LAST_TRAIN_BUFFER = 30  # 30 menit setelah kereta terakhir
+
+# Simulation parameters
+SIMULATION_SPEED = 60  # 60x real time (1 second = 1 minute in simulation)
+MAX_SIMULATION_TIME = 24 * 60  # 24 hours in minutes
+PASSENGER_GIVE_UP_WAIT_TIME = 120  # Passengers give up after 2 hours
+UPCOMING_TRAIN_CHECK_WINDOW = 120 # Check for upcoming trains within this window (minutes) for passenger generation
+
+# StateTimeline: a snapshot every 15 simulated minutes, a full one every 2 hours and deltas against the previous one in between
+SNAPSHOT_INTERVAL = 15
+SNAPSHOT_KEYFRAME_EVERY = 8
+
+# Simulation engines: "tick" steps every minute, "event" jumps between scheduled events.
+# Both let passengers give up PASSENGER_GIVE_UP_WAIT_TIME + 1 minutes after arriving. The event
+# engine serves a stop at its exact (fractional) time, the tick engine in the first tick at or after
+# it, so a passenger arriving in between only catches that train in the tick engine: cross-check the
+# engines on averages over replications, not run by run.
+TICK_ENGINE = "tick"
+EVENT_ENGINE = "event"
+
+# Event kinds for the event engine, also the processing order for events at the same time:
+# a passenger arriving as a train stops still catches it, and a train stopping exactly when
+# a passenger's patience runs out still picks them up
+PASSENGER_ARRIVAL_EVENT = 0
+TRAIN_DEPARTURE_EVENT = 1  # Initial departure from the origin station
+TRAIN_ARRIVAL_EVENT = 2
+GIVE_UP_EVENT = 3
+
+# Passenger generation: "online" draws arrivals minute by minute as the simulation runs,
+# "presampled" draws the whole day's arrival stream up front with array operations
+ONLINE_ARRIVALS = "online"
+PRESAMPLED_ARRIVALS = "presampled"
+
+# Phases of one simulation step, as reported by Profiler
+GENERATION_PHASE = "generation"     # Passenger arrivals
+TRAINS_PHASE = "trains"             # Train arrival, alighting and boarding
+GIVE_UP_PHASE = "give_up"           # Removing passengers who waited too long
+STATS_CHECK_PHASE = "stats_check"   # Recount of the passenger counters (debug only)
+OCCUPANCY_PHASE = "occupancy"       # Occupancy / seated percentage recording
+EVENT_PHASES = {
+    PASSENGER_ARRIVAL_EVENT: GENERATION_PHASE,
+    TRAIN_DEPARTURE_EVENT: TRAINS_PHASE,
+    TRAIN_ARRIVAL_EVENT: TRAINS_PHASE,
+    GIVE_UP_EVENT: GIVE_UP_PHASE,
+}
+
+# Station data: (name, jarak km (kurang lebih))
+STATIONS = [
+    ("YK", 0),       # st Yogyakarta
+    ("LPN", 3),      # Lempuyangan
+    ("MGW", 9),     # Maguwo
+    ("KT", 30),      # Klaten
+    ("PWS", 60),     # Purwosari
+    ("SLO", 64)      # Solo Balapan
+]
+STATION_INDEX = {name: idx for idx, (name, _) in enumerate(STATIONS)}
+
+# Jadwal Kereta: (waktu keberangkatan dari Yogya dalam menit dari 00:00, kapasitas)
+TRAIN_SCHEDULE = [
+    (5 * 60 + 5, 1600),     # 05:05
+    (6 * 60 + 0, 1600),     # 06:00
+    (7 * 60 + 5, 1600),     # 07:05
+    (7 * 60 + 54, 1600),    # 07:54
+    (8 * 60 + 49, 1600),    # 08:49
+    (10 * 60 + 56, 1600),   # 10:56
+    (12 * 60 + 7, 1600),    # 12:07
+    (13 * 60 + 57, 1600),   # 13:57
+    (15 * 60 + 1, 1600),    # 15:01
+    (16 * 60 + 10, 1600),   # 16:10
+    (17 * 60 + 35, 1600),   # 17:35
+    (18 * 60 + 8, 1600),    # 18:08
+    (20 * 60 + 15, 1600),   # 20:15
+    (21 * 60 + 20, 1600),   # 21:20
+    (22 * 60 + 35, 1600),   # 22:35
+]
+
+# Rate penumpang per jam per stasiun
+PASSENGER_RATES = {}
+for hour in range(24):
+    PASSENGER_RATES[hour] = {}
+    for station_name, _ in STATIONS:
+        # Default low rate for early morning and late night (0-5, 24)
+        rate = 0.75
+        
+        # PAGI SIBUK (6-8 AM) - Rush hour pagi hari
+        if 6 <= hour <= 8:
+            match station_name:
+                case "YK":
+                    rate = 14.0  # Yogya sebagai stasiun awal
+                case "LPN":
+                    rate = 4.0   # Lempuyangan cukup ramai
+                case "MGW":
+                    rate = 2.0   # Maguwo (airport commuters)
+                case "KT":
+                    rate = 5.0   # Klaten hub utama
+                case "PWS":
+                    rate = 0.5   # Purwosari sedang
+                case "SLO":
+                    rate = 0.1   # Solo sedikit (stasiun akhir)
+        
+        # TRANSISI PAGI (9 AM) - Sisa jam sibuk pagi
+        elif hour == 9:
+            match station_name:
+                case "YK":
+                    rate = 12.0
+                case "LPN":
+                    rate = 3.0
+                case "MGW":
+                    rate = 2.0
+                case "KT":
+                    rate = 4.0
+                case "PWS":
+                    rate = 0.5
+                case "SLO":
+                    rate = 0.05
+        
+        # SIANG HARI (10-15) - Jam kerja normal, traffic sedang
+        elif 10 <= hour <= 15:
+            match station_name:
+                case "YK":
+                    rate = 7.0   
+                case "LPN":
+                    rate = 1.5   
+                case "MGW":
+                    rate = 1.0  
+                case "KT":
+                    rate = 1.5  
+                case "PWS":
+                    rate = 0.8   
+                case "SLO":
+                    rate = 0.1
+        
+        # SORE SIBUK (16-17) - Peak hour sore hari
+        elif 16 <= hour <= 18:
+            match station_name:
+                case "YK":
+                    rate = 18.0  # Peak tertinggi untuk jam pulang kerja
+                case "LPN":
+                    rate = 6.0   
+                case "MGW":
+                    rate = 4.0   
+                case "KT":
+                    rate = 6.0   # Banyak yang pulang kerja
+                case "PWS":
+                    rate = 3.0   
+                case "SLO":
+                    rate = 0.5
+        
+        # SORE RAMAI (18-21) - Jam sibuk sore lanjutan
+        elif 19<= hour <= 21:
+            match station_name:
+                case "YK":
+                    rate = 14.0  # Masih tinggi tapi mulai menurun
+                case "LPN":
+                    rate = 4.0   
+                case "MGW":
+                    rate = 3.0   
+                case "KT":
+                    rate = 4.0   
+                case "PWS":
+                    rate = 2.5   
+                case "SLO":
+                    rate = 0.8
+        
+        # MALAM (22-23) - Masih ada tapi menurun
+        elif 22 <= hour <= 23:
+            match station_name:
+                case "YK":
+                    rate = 4.0   # Masih ada yang pulang malam
+                case "LPN":
+                    rate = 1.2
+                case "MGW":
+                    rate = 1.0
+                case "KT":
+                    rate = 2.0   # Masih agak tinggi
+                case "PWS":
+                    rate = 0.6
+                case "SLO":
+                    rate = 0.1
+        
+        # Jam yang tidak terdefinisi menggunakan default rate
+        
+        PASSENGER_RATES[hour][station_name] = rate
+
+# Jenis hari untuk simulasi beberapa hari: pengali permintaan per jam terhadap PASSENGER_RATES (hari kerja)
+WEEKDAY = "weekday"
+WEEKEND = "weekend"
+HOLIDAY = "holiday"
+DAY_TYPE_DEMAND = {
+    WEEKDAY: [1.0] * 24,
+    # Akhir pekan: jam berangkat kerja/sekolah (05-08) dan pulang (16-18) lebih sepi, siang lebih ramai (wisata, belanja)
+    WEEKEND: [1.0] * 5 + [0.6] * 4 + [1.2] * 7 + [0.8] * 3 + [1.0] * 5,
+    # Libur nasional: perjalanan mudik/wisata sepanjang hari (08-20) lebih ramai
+    HOLIDAY: [1.0] * 8 + [1.3] * 13 + [1.0] * 3,
+}
+
+# Destination matrix: probability of going from origin to destination
+# Passengers can only travel forward (to next stations) since this is one-way KRL
+DESTINATION_PROBS = {}
+for i, (origin, _) in enumerate(STATIONS):
+    DESTINATION_PROBS[origin] = {}
+
+    # probabilitas perjalanan ke stasiun tujuan - disesuaikan dengan data real kereta 08:49
+    if origin == "YK":
+        # Dari Yogya naik 656, di Purwosari turun 320, sisanya ke Solo = 296
+        # Distribusi turun: LPN(0), MGW(0), KT(40), PWS(320), SLO(296)
+        DESTINATION_PROBS[origin] = {
+            "LPN": 0.01,  # 1% turun di lempuyangan (sangat sedikit berdasarkan data)
+            "MGW": 0.02,  # 2% turun di maguwo (sangat sedikit berdasarkan data)
+            "KT": 0.1,   # 6% turun di klaten (40/656 = 6%)
+            "PWS": 0.45,  # 42% turun di purwosari (320/656 = 49%, tapi disesuaikan dengan penumpang dari stasiun lain)
+            "SLO": 0.42   # 45% sampai solo balapan (296/656 = 45%)
+        }
+    elif origin == "LPN":
+        # Dari pattern yang sama, kebanyakan ke PWS dan SLO
+        DESTINATION_PROBS[origin] = {
+            "MGW": 0.01,  # 2% turun di maguwo
+            "KT": 0.1,   # 8% turun di klaten 
+            "PWS": 0.47,  # 50% turun di purwosari (mengikuti pola mayoritas)
+            "SLO": 0.42   # 40% sampai solo
+        }
+    elif origin == "MGW":
+        DESTINATION_PROBS[origin] = {
+            "KT": 0.10,   # 10% turun di klaten
+            "PWS": 0.55,  # 55% turun di purwosari (mengikuti pola mayoritas)
+            "SLO": 0.35   # 35% sampai solo
+        }
+    elif origin == "KT":
+        # Dari Klaten naik 208, sebagian ke PWS, sebagian ke SLO
+        DESTINATION_PROBS[origin] = {
+            "PWS": 0.60,  # 60% turun di purwosari 
+            "SLO": 0.40   # 40% lanjut ke solo
+        }
+    elif origin == "PWS":
+        # Dari PWS hanya sedikit naik (12), semuanya ke Solo
+        DESTINATION_PROBS[origin] = {
+            "SLO": 1.0  # 100% ke Solo karena stasiun terakhir
+        }
+    elif origin == "SLO":
+        DESTINATION_PROBS[origin] = {}  # Tidak ada tujuan dari Solo (stasiun terakhir)
+
+# Parameters
+TRAIN_CAPACITY = 1600       # Total train capacity (8 gerbong x 175 penumpang)
+SEATED_CAPACITY = 512      # seat tiap gerbong 64 (64 x 8)
+TRAIN_SPEED = 1.33         # 80 km/h = 1.33 km/min
+BOARDING_TIME = 4         # Minutes for boarding at each station
+DWELL_TIME = 2            # Additional time spent at each station
+
+def train_stop_times(departure_time):
+    """Arrival time at each station for a train leaving the origin at departure_time (same arithmetic as Train)"""
+    stop_times = [departure_time]
+    for idx in range(1, len(STATIONS)):
+        departure = stop_times[-1] + BOARDING_TIME + DWELL_TIME
+        travel_distance = max(0, STATIONS[idx][1] - STATIONS[idx - 1][1])
+        stop_times.append(departure + travel_distance / TRAIN_SPEED)
+    return stop_times
+
+def minutes_to_time_str(minutes):
+    """HH:MM of a time in minutes since midnight (fractions dropped)"""
+    return f"{int(minutes) // 60:02d}:{int(minutes) % 60:02d}"
+
+def passenger_rate_matrix():
+    """PASSENGER_RATES as an hour x station array"""
+    return np.array([[PASSENGER_RATES[hour].get(name, 0) for name, _ in STATIONS] for hour in range(24)])
+
+def day_type_rates(day_type, rates=None):
+    """Hour x station passenger rates for a day type (see DAY_TYPE_DEMAND), scaling rates (default PASSENGER_RATES)"""
+    rates = passenger_rate_matrix() if rates is None else rates
+    return rates * np.array(DAY_TYPE_DEMAND[day_type])[:, None]
+
+def week_calendar(days=7, first_weekday=0, holidays=(), schedules=None):
+    """(day type, schedule) per day: Monday-Friday weekdays, Saturday-Sunday weekend, `holidays` (day numbers) holidays
+
+    first_weekday is the weekday of day 0 (0 = Monday); schedules maps a day type to its timetable
+    (default TRAIN_SCHEDULE for every day type).
+    """
+    schedules = schedules or {}
+    calendar = []
+    for day in range(days):
+        if day in holidays:
+            day_type = HOLIDAY
+        elif (first_weekday + day) % 7 >= 5:
+            day_type = WEEKEND
+        else:
+            day_type = WEEKDAY
+        calendar.append((day_type, schedules.get(day_type, TRAIN_SCHEDULE)))
+    return calendar
+
+def run_days(calendar, **simulation_options):
+    """Run consecutive days on one Simulation instance, yielding (day, day type, simulation) after each day
+
+    The simulation is reset for the next day when the generator resumes, so read its results
+    (get_results(), result_tables(), occupancy) before that.
+    """
+    simulation = None
+    scenario = simulation_options.get("scenario")
+    for day, (day_type, schedule) in enumerate(calendar):
+        rates = day_type_rates(day_type, None if scenario is None else scenario.rates)
+        if simulation is None:
+            simulation = Simulation(schedule=schedule, rates=rates, **simulation_options)
+        else:
+            simulation.start_day(day, schedule, rates)
+        simulation.run()
+        yield day, day_type, simulation
+
+def destination_matrix():
+    """DESTINATION_PROBS as an origin x destination probability array (all zero for origins without destinations)"""
+    matrix = np.zeros((len(STATIONS), len(STATIONS)))
+    for origin, destinations in DESTINATION_PROBS.items():
+        for destination, probability in destinations.items():
+            matrix[STATION_INDEX[origin], STATION_INDEX[destination]] = probability
+    totals = matrix.sum(axis=1, keepdims=True)
+    return np.divide(matrix, totals, out=np.zeros_like(matrix), where=totals > 0)
+
+# Waiting times are summed as integer multiples of 1/WAITING_TIME_TICKS minute (about 57 microseconds),
+# so the sums don't depend on the order passengers are added in (bounded memory folds them in as they retire)
+WAITING_TIME_TICKS = 2 ** 20
+WAITING_TIME_BINS = PASSENGER_GIVE_UP_WAIT_TIME + 2  # 1-minute waiting time histogram bins (longest wait is 121 minutes)
+
+# Passenger state bits stored in PassengerStore.state
+WAITING = 1     # Still waiting at the origin station
+SEATED = 2      # Got a seat (at boarding or later in the trip)
+COMPLETED = 4   # Journey is completed
+RETIRED = 8     # Folded into RetiredPassengers (bounded-memory mode); the row is free or about to be
+
+class PassengerStore:
+    """All passengers of a simulation as growable NumPy columns; a passenger is a row index
+
+    Rows of retired passengers are handed out again by add() / add_many(), so `serial` (not the
+    row index) identifies a passenger over the whole run.
+    """
+
+    COLUMNS = ("serial", "origin", "destination", "arrival_time", "boarding_time", "train_id", "state")
+
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self.next_serial = 0
+        self.free = []  # Released rows, reused before the store grows
+        self.serial = np.empty(capacity, dtype=np.int64)          # Order in which passengers were added
+        self.origin = np.empty(capacity, dtype=np.int8)           # Index into STATIONS
+        self.destination = np.empty(capacity, dtype=np.int8)      # Index into STATIONS
+        self.arrival_time = np.empty(capacity, dtype=np.float64)  # Time arrived at the origin station
+        self.boarding_time = np.empty(capacity, dtype=np.float64) # Time boarded the train (NaN if never)
+        self.train_id = np.empty(capacity, dtype=np.int16)        # Train the passenger boarded (-1 if none)
+        self.state = np.empty(capacity, dtype=np.uint8)           # WAITING / SEATED / COMPLETED / RETIRED bits
+
+    def grow(self):
+        capacity = 2 * len(self.state)
+        for column in self.COLUMNS:
+            old = getattr(self, column)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, column, new)
+
+    def add(self, origin_idx, destination_idx, arrival_time):
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.size == len(self.state):
+                self.grow()
+            index = self.size
+            self.size += 1
+        self.serial[index] = self.next_serial
+        self.next_serial += 1
+        self.origin[index] = origin_idx
+        self.destination[index] = destination_idx
+        self.arrival_time[index] = arrival_time
+        self.boarding_time[index] = np.nan
+        self.train_id[index] = -1
+        self.state[index] = WAITING
+        return index
+
+    def add_many(self, origin, destination, arrival_time):
+        """Add a batch of passengers (free rows first, then appended ones); returns their row indices"""
+        count = len(origin)
+        reused = min(count, len(self.free))
+        appended = count - reused
+        while self.size + appended > len(self.state):
+            self.grow()
+        if reused:
+            rows = np.empty(count, dtype=np.int64)
+            rows[:reused] = self.free[-reused:]
+            del self.free[-reused:]
+            rows[reused:] = np.arange(self.size, self.size + appended)
+        else:
+            rows = slice(self.size, self.size + count)  # Contiguous: slice assignment is faster
+        self.size += appended
+        self.serial[rows] = np.arange(self.next_serial, self.next_serial + count)
+        self.next_serial += count
+        self.origin[rows] = origin
+        self.destination[rows] = destination
+        self.arrival_time[rows] = arrival_time
+        self.boarding_time[rows] = np.nan
+        self.train_id[rows] = -1
+        self.state[rows] = WAITING
+        return rows if reused else np.arange(rows.start, rows.stop)
+
+    def clear(self):
+        """Drop every passenger, keeping the allocated columns (serials keep counting)"""
+        self.size = 0
+        self.free = []
+
+    def release(self, indices):
+        """Mark passengers as retired and hand their rows out again"""
+        self.state[indices] |= RETIRED
+        self.free.extend(indices)
+
+    def capture_state(self):
+        """Copies of the filled rows plus the row bookkeeping (see Simulation.capture_state)"""
+        state = {column: getattr(self, column)[:self.size].copy() for column in self.COLUMNS}
+        state.update(size=self.size, next_serial=self.next_serial, free=np.array(self.free, dtype=np.int64))
+        return state
+
+    def restore_state(self, state):
+        self.size = 0  # Nothing to carry over when growing
+        while len(self.state) < state["size"]:
+            self.grow()
+        for column in self.COLUMNS:
+            getattr(self, column)[:state["size"]] = state[column]
+        self.size = state["size"]
+        self.next_serial = state["next_serial"]
+        self.free = state["free"].tolist()
+
+    def live(self):
+        """Mask over the filled rows of passengers that are not retired"""
+        return (self.column("state") & RETIRED) == 0
+
+    def column(self, name):
+        """Filled part of a column (a view, no copy)"""
+        return getattr(self, name)[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not -self.size <= index < self.size:
+            raise IndexError("passenger index out of range")
+        return Passenger(self, index % self.size)
+
+    def __iter__(self):
+        return (Passenger(self, index) for index in range(self.size))
+
+class Passenger:
+    """View of one passenger row in a PassengerStore, with the attributes of the old Passenger object"""
+    __slots__ = ("store", "id")
+
+    def __init__(self, store, id):
+        self.store = store
+        self.id = id
+
+    @property
+    def origin(self):
+        return STATIONS[self.store.origin[self.id]][0]
+
+    @property
+    def destination(self):
+        return STATIONS[self.store.destination[self.id]][0]
+
+    @property
+    def arrival_time(self):
+        return float(self.store.arrival_time[self.id])
+
+    @property
+    def boarding_time(self):
+        boarding_time = self.store.boarding_time[self.id]
+        return None if np.isnan(boarding_time) else float(boarding_time)
+
+    @property
+    def train_id(self):
+        train_id = self.store.train_id[self.id]
+        return None if train_id < 0 else int(train_id)
+
+    @property
+    def waiting_at_station(self):
+        return bool(self.store.state[self.id] & WAITING)
+
+    @property
+    def seated(self):
+        return bool(self.store.state[self.id] & SEATED)
+
+    @property
+    def completed(self):
+        return bool(self.store.state[self.id] & COMPLETED)
+
+    def __repr__(self):
+        return f"Passenger {self.id}: {self.origin} -> {self.destination}"
+
+class RandomStreams:
+    """Independent numpy Generators per station and purpose, all derived from one scenario seed
+
+    With common_random_numbers the simulation consumes the same draws for every station and minute
+    whatever the timetable (arrivals outside the service window are drawn and discarded), so
+    alternative schedules run with the same seed see identical passenger streams.
+    """
+    ARRIVALS = 0       # Arrival counts / inter-arrival times
+    DESTINATIONS = 1   # Destination of each arriving passenger
+
+    def __init__(self, seed=None, common_random_numbers=False):
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.common_random_numbers = common_random_numbers
+        self.start_day(0)
+
+    def stream(self, purpose, station_idx, day=0):
+        # spawn_key makes each stream depend only on (seed, purpose, station, day)
+        spawn_key = (purpose, station_idx) if day == 0 else (purpose, station_idx, day)
+        seed_sequence = np.random.SeedSequence(self.seed, spawn_key=spawn_key)
+        return np.random.Generator(np.random.PCG64(seed_sequence))
+
+    def start_day(self, day):
+        """Fresh streams for a day of a multi-day run, so each day's draws don't depend on earlier days"""
+        self.day = day
+        self.arrivals = [self.stream(self.ARRIVALS, idx, day) for idx in range(len(STATIONS))]
+        self.destinations = [self.stream(self.DESTINATIONS, idx, day) for idx in range(len(STATIONS))]
+
+class ArrivalStream:
+    """A whole day of passenger arrivals sampled up front, grouped by arrival minute"""
+
+    def __init__(self, start_time, counts, origin, destination):
+        per_minute = counts.sum(axis=1)  # counts: minute x station, starting at start_time
+        self.start_time = start_time
+        self.offsets = np.concatenate(([0], np.cumsum(per_minute)))
+        self.minutes_with_arrivals = start_time + np.flatnonzero(per_minute)
+        self.origin = origin            # Station index of every arrival, in arrival order
+        self.destination = destination
+
+    def __len__(self):
+        return len(self.origin)
+
+    def arrivals_at(self, minute):
+        """(origins, destinations) of the passengers arriving at the given minute"""
+        i = minute - self.start_time
+        if not 0 <= i < len(self.offsets) - 1:
+            return self.origin[:0], self.destination[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.origin[start:end], self.destination[start:end]
+
+    def next_arrival_minute(self, time):
+        """First minute at or after time with any arrivals, None if there are none left"""
+        i = np.searchsorted(self.minutes_with_arrivals, time)
+        return int(self.minutes_with_arrivals[i]) if i < len(self.minutes_with_arrivals) else None
+
+class Timetable:
+    """Arrival time of every train at every station, for binary-searched "next train at station s after t" lookups
+
+    Built from STATIONS distances, TRAIN_SPEED, BOARDING_TIME and DWELL_TIME exactly like the trains
+    move (train_stop_times); the schedule must be sorted by departure time.
+    """
+
+    def __init__(self, schedule):
+        self.stop_times = np.array([train_stop_times(departure) for departure, _ in schedule]).reshape(len(schedule), len(STATIONS))
+        # The tick engine serves a stop in the first tick at or after its arrival time
+        self.stop_ticks = np.ceil(self.stop_times)
+        self.stops_by_station = self.stop_times.T.tolist()  # Per station, non-decreasing over the trains
+        self.ticks_by_station = self.stop_ticks.T.tolist()
+
+    def next_train(self, station_idx, time, tick=False):
+        """Index of the first train that has not served the station yet at `time`, None if there is none
+
+        A train stopping exactly at `time` (or, with tick, in the tick `time`) has not served it yet.
+        """
+        stops = self.ticks_by_station[station_idx] if tick else self.stops_by_station[station_idx]
+        i = bisect.bisect_left(stops, time)
+        return i if i < len(stops) else None
+
+    def next_arrival(self, station_idx, time, tick=False):
+        """Arrival time of the next train at the station (see next_train), None if there is none"""
+        i = self.next_train(station_idx, time, tick)
+        return None if i is None else self.stops_by_station[station_idx][i]
+
+    def upcoming_mask(self, minutes, window, tick=True):
+        """minute x station: whether a train still to serve the station (see next_train) is due within `window`"""
+        stops = self.stop_ticks if tick else self.stop_times
+        mask = np.zeros((len(minutes), len(STATIONS)), dtype=bool)
+        for station_idx in range(len(STATIONS)):
+            next_idx = np.searchsorted(stops[:, station_idx], minutes, side="left")
+            has_next = next_idx < len(self.stop_times)
+            arrival = self.stop_times[np.minimum(next_idx, len(self.stop_times) - 1), station_idx]
+            mask[:, station_idx] = has_next & (arrival - minutes <= window)
+        return mask
+
+# Passenger lifecycle events written to an EventSink
+ARRIVAL_LOG_EVENT = 0      # Passenger arrives at the origin station (detail: destination station index)
+BOARD_LOG_EVENT = 1        # Passenger boards a train (detail: 1 if seated)
+SEAT_GAINED_LOG_EVENT = 2  # Standing passenger gets a seat mid-trip
+ALIGHT_LOG_EVENT = 3       # Passenger alights at the destination (detail: 1 if seated)
+GIVE_UP_LOG_EVENT = 4      # Passenger leaves the station after waiting too long
+LOG_EVENT_NAMES = ["arrival", "board", "seat_gained", "alight", "give_up"]
+
+# Binary event log: EVENT_LOG_MAGIC followed by packed records (21 bytes each)
+EVENT_LOG_MAGIC = b"KRLEVT01"
+EVENT_RECORD_DTYPE = np.dtype([("kind", "u1"), ("station", "i1"), ("detail", "i1"), ("train", "<i2"),
+                               ("passenger", "<i8"), ("time", "<f8")])
+
+def log_event_dict(kind, time, passenger, station, train, detail):
+    """One event as the dict written to JSONL logs and yielded by read_event_log"""
+    event = {"event": LOG_EVENT_NAMES[kind], "time": time, "passenger": passenger, "station": STATIONS[station][0]}
+    if kind == ARRIVAL_LOG_EVENT:
+        event["destination"] = STATIONS[detail][0]
+    elif kind != GIVE_UP_LOG_EVENT:
+        event["train"] = train
+        if kind != SEAT_GAINED_LOG_EVENT:
+            event["seated"] = bool(detail)
+    return event
+
+class EventSink:
+    """Receives passenger lifecycle events from a Simulation; buffered, so close() (or a with block) when done"""
+
+    def __init__(self, file, buffer_size=65536):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def emit(self, kind, time, passenger, station, train=-1, detail=0):
+        self.buffer.append((kind, station, detail, train, passenger, time))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def emit_arrivals(self, time, passengers, origins, destinations):
+        """ARRIVAL events of a batch of passengers (arrays of serials, origins and destinations)"""
+        for passenger, origin, destination in zip(passengers.tolist(), origins.tolist(), destinations.tolist()):
+            self.emit(ARRIVAL_LOG_EVENT, time, passenger, origin, -1, destination)
+
+    def flush(self):
+        if self.buffer:
+            self.write_records(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def write_records(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class JsonlEventSink(EventSink):
+    """One JSON object per line; easy to inspect, roughly 5x larger than the binary format"""
+
+    def __init__(self, path, buffer_size=65536):
+        super().__init__(open(path, "w"), buffer_size)
+
+    def write_records(self, records):
+        self.file.write("".join(json.dumps(log_event_dict(kind, time, passenger, station, train, detail)) + "\n"
+                                for kind, station, detail, train, passenger, time in records))
+
+class BinaryEventSink(EventSink):
+    """Packed EVENT_RECORD_DTYPE records after a EVENT_LOG_MAGIC header"""
+
+    def __init__(self, path, buffer_size=65536):
+        super().__init__(open(path, "wb"), buffer_size)
+        self.file.write(EVENT_LOG_MAGIC)
+
+    def emit_arrivals(self, time, passengers, origins, destinations):
+        self.flush()  # Keep the buffered events before this batch
+        records = np.empty(len(origins), dtype=EVENT_RECORD_DTYPE)
+        records["kind"] = ARRIVAL_LOG_EVENT
+        records["station"] = origins
+        records["detail"] = destinations
+        records["train"] = -1
+        records["passenger"] = passengers
+        records["time"] = time
+        self.file.write(records.tobytes())
+
+    def write_records(self, records):
+        self.file.write(np.array(records, dtype=EVENT_RECORD_DTYPE).tobytes())
+
+def open_event_log(path, buffer_size=65536):
+    """JsonlEventSink for .jsonl paths, BinaryEventSink otherwise"""
+    sink = JsonlEventSink if str(path).endswith(".jsonl") else BinaryEventSink
+    return sink(path, buffer_size)
+
+def read_event_chunks(path, chunk_size=65536):
+    """Stream a binary event log as structured arrays of up to chunk_size records"""
+    with open(path, "rb") as f:
+        if f.read(len(EVENT_LOG_MAGIC)) != EVENT_LOG_MAGIC:
+            raise ValueError(f"{path} is not a binary KRL event log")
+        while True:
+            data = f.read(chunk_size * EVENT_RECORD_DTYPE.itemsize)
+            if not data:
+                return
+            yield np.frombuffer(data, dtype=EVENT_RECORD_DTYPE)
+
+def read_event_log(path, chunk_size=65536):
+    """Stream the events of a binary or JSONL event log as dicts, one at a time"""
+    with open(path, "rb") as f:
+        binary = f.read(len(EVENT_LOG_MAGIC)) == EVENT_LOG_MAGIC
+    if binary:
+        for chunk in read_event_chunks(path, chunk_size):
+            for kind, station, detail, train, passenger, time in chunk.tolist():
+                yield log_event_dict(kind, time, passenger, station, train, detail)
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+class Train:
+    def __init__(self, id, departure_time, capacity, seated_capacity, simulation):
+        self.id = id
+        self.seated_capacity = seated_capacity  # Number of seats available
+        self.simulation = simulation  # Reference to simulation object for statistics
+        self.reset(departure_time, capacity)
+
+    def reset(self, departure_time, capacity):
+        """Put the train, empty, at the origin station for a new departure"""
+        self.departure_time = departure_time
+        self.capacity = capacity  # Total capacity (seated + standing)
+        # Passengers on board (indices into the simulation's PassengerStore), bucketed by destination station
+        self.passengers_by_destination = [[] for _ in STATIONS]
+        # Standing passengers in boarding order; entries of passengers who already alighted are skipped lazily
+        self.standing_queue = deque()
+        self.held_passengers = []  # Retired passengers whose rows are released when the train finishes (bounded-memory mode)
+        self.passenger_count = 0  # Total on board (seated + standing)
+        self.seated_count = 0
+        self.standing_count = 0
+        self.current_station_idx = 0
+        self.next_station_time = departure_time # Initially, this is the departure time from origin
+        self.completed = False
+    
+    def _alight_passengers_at_current_station(self):
+        current_station_name = self.get_current_station()
+        if not current_station_name:
+            return
+
+        # Passengers for this station, in boarding order
+        passengers_to_remove = self.passengers_by_destination[self.current_station_idx]
+        if not passengers_to_remove:
+            return
+        self.passengers_by_destination[self.current_station_idx] = []
+
+        store = self.simulation.passengers
+        state = store.state
+        stats = self.simulation.stats
+        event_log = self.simulation.event_log
+        time = self.next_station_time  # Arrival time at this station
+        for passenger in passengers_to_remove:
+            seated = state[passenger] & SEATED
+            # COMPLETED also marks the passenger's entry in standing_queue as stale
+            state[passenger] |= COMPLETED
+            self.passenger_count -= 1
+            stats["passengers_completed"] += 1
+            if event_log is not None:
+                event_log.emit(ALIGHT_LOG_EVENT, time, int(store.serial[passenger]), self.current_station_idx, self.id,
+                               1 if seated else 0)
+            if seated:
+                self.seated_count -= 1
+                stats["passengers_seated"] -= 1
+                # When a seat becomes available, give it to the longest-waiting standing passenger
+                # (standing_queue is in boarding order, so that is the first one not yet alighted)
+                if self.standing_count:
+                    while state[self.standing_queue[0]] & COMPLETED:
+                        self.standing_queue.popleft()
+                    next_to_seat = self.standing_queue.popleft()
+                    state[next_to_seat] |= SEATED
+                    self.standing_count -= 1
+                    self.seated_count += 1
+                    stats["passengers_standing"] -= 1
+                    stats["passengers_seated"] += 1
+                    if event_log is not None:
+                        event_log.emit(SEAT_GAINED_LOG_EVENT, time, int(store.serial[next_to_seat]),
+                                       self.current_station_idx, self.id)
+            else:
+                self.standing_count -= 1
+                stats["passengers_standing"] -= 1
+
+        if self.simulation.retired is not None:
+            self.simulation.retire_passengers(passengers_to_remove, release=False)
+            # Standing passengers can still have stale standing_queue entries: keep their rows until the train finishes
+            store.release([passenger for passenger in passengers_to_remove if state[passenger] & SEATED])
+            self.held_passengers.extend(passenger for passenger in passengers_to_remove if not state[passenger] & SEATED)
+
+    def board_passengers(self, station_queue, current_time):
+        """Board passengers from the head of the current station's arrival-ordered queue"""
+        station = self.get_current_station()
+        if not station:
+            return []
+        
+        boarded_passengers_this_train = []
+        store = self.simulation.passengers
+        event_log = self.simulation.event_log
+        waiting_times = self.simulation.stats["waiting_times"]  # None in bounded-memory mode
+
+        # The queue is ordered by arrival_time, so boarding is FIFO
+        while station_queue:
+            if self.passenger_count >= self.capacity:
+                # Train is full, this passenger and subsequent ones cannot board this train
+                # They stay queued with waiting_at_station = True
+                # unless they give up later in the main simulation loop.
+                break # Stop trying to board passengers on this train
+            
+            # Board the passenger
+            passenger = station_queue.popleft()
+            store.boarding_time[passenger] = current_time
+            store.train_id[passenger] = self.id
+            self.passengers_by_destination[store.destination[passenger]].append(passenger)
+            self.passenger_count += 1
+
+            if self.seated_count < self.seated_capacity:
+                store.state[passenger] = SEATED  # No longer waiting for THIS train
+                self.seated_count += 1
+                self.simulation.stats["passengers_seated"] += 1
+            else:
+                store.state[passenger] = 0  # No longer waiting, standing
+                self.standing_queue.append(passenger)
+                self.standing_count += 1
+                self.simulation.stats["passengers_standing"] += 1
+            
+            boarded_passengers_this_train.append(passenger) # Keep track for stats if needed
+            if event_log is not None:
+                event_log.emit(BOARD_LOG_EVENT, current_time, int(store.serial[passenger]), self.current_station_idx, self.id,
+                               1 if store.state[passenger] & SEATED else 0)
+            
+            if waiting_times is not None:
+                waiting_time = current_time - float(store.arrival_time[passenger])
+                waiting_times[self.id].append(waiting_time)
+        
+        return boarded_passengers_this_train
+
+    def _prepare_for_travel_to_next_station(self, arrival_time_at_serviced_station):
+        if self.completed:
+            return
+
+        # Departure time from the station just serviced (current_station_idx before increment)
+        departure_time = arrival_time_at_serviced_station + BOARDING_TIME + DWELL_TIME
+        
+        self.current_station_idx += 1
+        
+        if self.current_station_idx >= len(STATIONS):
+            self.completed = True
+            return
+        
+        # Calculate travel time to the new STATIONS[self.current_station_idx]
+        departing_station_dist = STATIONS[self.current_station_idx - 1][1]
+        destination_station_dist = STATIONS[self.current_station_idx][1]
+        
+        travel_distance = destination_station_dist - departing_station_dist
+        # Basic check for valid distance, though STATIONS should be ordered
+        travel_distance = max(0, travel_distance) 
+            
+        travel_time = travel_distance / TRAIN_SPEED
+        
+        # Set the arrival time for the next station
+        self.next_station_time = departure_time + travel_time
+    
+    def capture_state(self):
+        """Position, counters and the passengers on board (see Simulation.capture_state)"""
+        return {
+            "departure_time": self.departure_time,
+            "capacity": self.capacity,
+            "passengers_by_destination": [np.array(passengers, dtype=np.int64) for passengers in self.passengers_by_destination],
+            "standing_queue": np.array(self.standing_queue, dtype=np.int64),
+            "held_passengers": np.array(self.held_passengers, dtype=np.int64),
+            "passenger_count": self.passenger_count,
+            "seated_count": self.seated_count,
+            "standing_count": self.standing_count,
+            "current_station_idx": self.current_station_idx,
+            "next_station_time": self.next_station_time,
+            "completed": self.completed,
+        }
+
+    def restore_state(self, state):
+        self.reset(state["departure_time"], state["capacity"])
+        self.passengers_by_destination = [passengers.tolist() for passengers in state["passengers_by_destination"]]
+        self.standing_queue.extend(state["standing_queue"].tolist())
+        self.held_passengers = state["held_passengers"].tolist()
+        for name in ("passenger_count", "seated_count", "standing_count", "current_station_idx", "next_station_time",
+                     "completed"):
+            setattr(self, name, state[name])
+
+    def get_current_station(self):
+        if self.current_station_idx < len(STATIONS):
+            return STATIONS[self.current_station_idx][0]
+        return None
+    
+    def get_next_station(self):
+        if self.current_station_idx + 1 < len(STATIONS):
+            return STATIONS[self.current_station_idx + 1][0]
+        return None
+    
+    def __repr__(self):
+        return f"Train {self.id}: {self.passenger_count}/{self.capacity} total, {self.seated_count}/{self.seated_capacity} seated, {self.standing_count} standing"
+
+
+class ResultTables:
+    """Passenger outcomes grouped by (train, origin, destination, seated) in one pass over the PassengerStore
+
+    By default all passengers that are not retired are grouped, plus the tables of the retired ones
+    if given; `rows` restricts the pass to some rows (used to fold passengers into the retired tables).
+    """
+
+    TABLES = ("generated", "gave_up", "boarded", "waiting_time_ticks", "waiting_time_histogram", "completed")
+
+    def __init__(self, store, num_trains, rows=None, retired=None):
+        num_stations = len(STATIONS)
+        rows = store.live() if rows is None else rows
+        origin = store.column("origin")[rows].astype(np.int64)
+        train_id = store.column("train_id")[rows].astype(np.int64)
+        state = store.column("state")[rows]
+        boarded = train_id >= 0
+
+        self.generated = np.bincount(origin, minlength=num_stations)  # Per origin
+        self.gave_up = np.bincount(origin[~boarded & ((state & WAITING) == 0)], minlength=num_stations)
+
+        # Per (train, origin): boarded passengers and the sum of their waiting times
+        train_origin = train_id[boarded] * num_stations + origin[boarded]
+        waiting_times = store.column("boarding_time")[rows][boarded] - store.column("arrival_time")[rows][boarded]
+        self.boarded = np.bincount(train_origin, minlength=num_trains * num_stations).reshape(num_trains, num_stations)
+        # In WAITING_TIME_TICKS: whole ticks add up exactly in float64 (up to 2**53), whatever the order
+        ticks = np.rint(waiting_times * WAITING_TIME_TICKS)
+        self.waiting_time_ticks = np.bincount(train_origin, weights=ticks, minlength=num_trains * num_stations
+                                              ).reshape(num_trains, num_stations).astype(np.int64)
+        # Per train: waiting times in 1-minute bins, the last bin also holds anything longer
+        waiting_bin = np.minimum(waiting_times.astype(np.int64), WAITING_TIME_BINS - 1)
+        self.waiting_time_histogram = np.bincount(train_id[boarded] * WAITING_TIME_BINS + waiting_bin,
+                                                  minlength=num_trains * WAITING_TIME_BINS
+                                                  ).reshape(num_trains, WAITING_TIME_BINS)
+
+        # Completed journeys per (train, origin, destination, seated)
+        completed = (state[boarded] & COMPLETED) != 0
+        seated = (state[boarded] & SEATED) != 0
+        destination = store.column("destination")[rows][boarded].astype(np.int64)
+        key = (train_origin * num_stations + destination) * 2 + seated
+        self.completed = np.bincount(key[completed], minlength=num_trains * num_stations * num_stations * 2
+                                     ).reshape(num_trains, num_stations, num_stations, 2)
+        if retired is not None:
+            self.add(retired)
+
+    def add(self, other):
+        """Add the counts of other tables (same number of trains) to these"""
+        for name in self.TABLES:
+            getattr(self, name)[...] += getattr(other, name)
+
+    @property
+    def waiting_time_sum(self):
+        """Minutes waited per (train, origin) by the boarded passengers"""
+        return self.waiting_time_ticks / WAITING_TIME_TICKS
+
+    def seat_probability(self, origin_station=None):
+        """Share of completed journeys with a seat per train, optionally only from one origin station"""
+        by_origin = self.completed.sum(axis=2)  # train x origin x seated
+        counts = by_origin.sum(axis=1) if origin_station is None else by_origin[:, STATION_INDEX[origin_station]]
+        totals = counts.sum(axis=1)
+        return {int(train_id): float(counts[train_id, 1] / totals[train_id]) for train_id in np.flatnonzero(totals)}
+
+    def overall_seat_probability(self):
+        """Share of all completed journeys with a seat, None if nobody completed one"""
+        completed = self.completed.sum(axis=(0, 1, 2))  # [standing, seated]
+        return float(completed[1] / completed.sum()) if completed.sum() else None
+
+    def overall_avg_waiting_time(self):
+        """Average waiting time in minutes over every boarded passenger, None if nobody boarded"""
+        boarded = self.boarded.sum()
+        return float(self.waiting_time_sum.sum() / boarded) if boarded else None
+
+    def avg_waiting_times(self):
+        boarded = self.boarded.sum(axis=1)
+        waiting_time_sum = self.waiting_time_sum.sum(axis=1)
+        return {int(train_id): float(waiting_time_sum[train_id] / boarded[train_id]) for train_id in np.flatnonzero(boarded)}
+
+    def station_summary(self, station_code):
+        """Generated, completed, seated and gave-up passenger counts for one origin station"""
+        station_idx = STATION_INDEX[station_code]
+        completed = self.completed[:, station_idx].sum(axis=(0, 1))  # [standing, seated]
+        return {
+            "generated": int(self.generated[station_idx]),
+            "completed": int(completed.sum()),
+            "seated": int(completed[1]),
+            "gave_up": int(self.gave_up[station_idx]),
+        }
+
+
+class OccupancySeries:
+    """Occupancy and seated percentage per train and minute as train x minute arrays (NaN where not sampled)
+
+    With a directory the arrays are memory-mapped .npy files there instead of living in memory, laid
+    out like save_memmap() so load(directory) reads them back. Every series created on the same
+    directory writes the same files: a Simulation with occupancy_directory overwrites them at each
+    start_day(), so in multi-day runs they only hold the current day.
+    """
+
+    def __init__(self, num_trains, start_time, end_time, directory=None):
+        self.start_time = start_time
+        self.minutes = np.arange(start_time, end_time)  # Minute of each column
+        shape = (num_trains, len(self.minutes))
+        if directory is None:
+            self.occupancy = np.full(shape, np.nan, dtype=np.float32)  # % of total capacity
+            self.seated = np.full(shape, np.nan, dtype=np.float32)     # % of seats taken
+        else:
+            np.save(f"{directory}/minutes.npy", self.minutes)
+            self.occupancy = self.open_memmap(directory, "occupancy", shape)
+            self.seated = self.open_memmap(directory, "seated", shape)
+
+    @staticmethod
+    def open_memmap(directory, name, shape):
+        array = np.lib.format.open_memmap(f"{directory}/{name}.npy", mode="w+", dtype=np.float32, shape=shape)
+        array[:] = np.nan
+        return array
+
+    def record(self, train_id, start, end, occupancy_percentage, seated_percentage):
+        """Same sample for every minute in [start, end)"""
+        self.occupancy[train_id, start - self.start_time:end - self.start_time] = occupancy_percentage
+        self.seated[train_id, start - self.start_time:end - self.start_time] = seated_percentage
+
+    def samples(self, train_id):
+        """(minutes, occupancy, seated) of the minutes in which the train was sampled"""
+        sampled = ~np.isnan(self.occupancy[train_id])
+        return self.minutes[sampled], self.occupancy[train_id, sampled], self.seated[train_id, sampled]
+
+    def sampled_trains(self):
+        return np.flatnonzero((~np.isnan(self.occupancy)).any(axis=1))
+
+    def mean_occupancy(self):
+        """Average occupancy per train that was sampled at least once"""
+        return {int(train_id): float(np.nanmean(self.occupancy[train_id])) for train_id in self.sampled_trains()}
+
+    def peak_occupancy(self):
+        return {int(train_id): float(np.nanmax(self.occupancy[train_id])) for train_id in self.sampled_trains()}
+
+    def save_npz(self, path):
+        np.savez_compressed(path, minutes=self.minutes, occupancy=self.occupancy, seated=self.seated)
+
+    def save_memmap(self, directory):
+        """Write the arrays as .npy files that load(directory) maps instead of reading"""
+        for name in ("minutes", "occupancy", "seated"):
+            np.save(f"{directory}/{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, path):
+        """Series from a save_npz() file or, memory-mapped read-only, from a save_memmap() directory"""
+        if str(path).endswith(".npz"):
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in ("minutes", "occupancy", "seated")}
+        else:
+            arrays = {name: np.load(f"{path}/{name}.npy", mmap_mode="r") for name in ("minutes", "occupancy", "seated")}
+        series = cls.__new__(cls)
+        series.start_time = int(arrays["minutes"][0]) if len(arrays["minutes"]) else 0
+        for name, array in arrays.items():
+            setattr(series, name, array)
+        return series
+
+
+class Profiler:
+    """Opt-in instrumentation of a Simulation: wall time and calls per phase, queue and on-board gauges
+
+    Gauges are sampled once per simulated minute (tick engine) or at every train stop (event engine).
+    """
+
+    def __init__(self):
+        self.phase_time = defaultdict(float)  # Phase -> seconds
+        self.phase_calls = defaultdict(int)
+        self.gauges = {}  # "queue:<station>" / "onboard:<train id>" -> [samples, sum, max, last]
+
+    def measure(self, phase, function, *args):
+        start = perf_counter()
+        result = function(*args)
+        self.phase_time[phase] += perf_counter() - start
+        self.phase_calls[phase] += 1
+        return result
+
+    def gauge(self, name, value):
+        gauge = self.gauges.get(name)
+        if gauge is None:
+            self.gauges[name] = [1, value, value, value]
+        else:
+            gauge[0] += 1
+            gauge[1] += value
+            gauge[2] = max(gauge[2], value)
+            gauge[3] = value
+
+    def sample_gauges(self, simulation, time):
+        for station_name, queue in simulation.station_queues.items():
+            self.gauge(f"queue:{station_name}", len(queue))
+        for train in simulation.trains:
+            if not train.completed and time >= train.departure_time:
+                self.gauge(f"onboard:{train.id}", train.passenger_count)
+
+    def report(self):
+        """Phase timings and gauge summaries as plain dicts"""
+        return {
+            "phases": {phase: {"calls": self.phase_calls[phase], "total_s": total,
+                               "per_call_us": 1e6 * total / self.phase_calls[phase]}
+                       for phase, total in self.phase_time.items()},
+            "gauges": {name: {"samples": samples, "mean": total / samples, "max": peak, "last": last}
+                       for name, (samples, total, peak, last) in self.gauges.items()},
+        }
+
+    def dump(self, path=None):
+        """Write report() as JSON to a file, or print a summary table without a path"""
+        report = self.report()
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            return
+        total = sum(phase["total_s"] for phase in report["phases"].values()) or 1
+        for name, phase in sorted(report["phases"].items(), key=lambda item: -item[1]["total_s"]):
+            print(f"{name:<12} {phase['total_s'] * 1e3:9.2f} ms {phase['total_s'] / total:6.1%} "
+                  f"{phase['calls']:>8} x {phase['per_call_us']:.1f} us")
+        for name, gauge in report["gauges"].items():
+            print(f"{name:<12} rata-rata {gauge['mean']:8.1f}  maks {gauge['max']:6}  akhir {gauge['last']:6}")
+
+
+class ArrayDelta:
+    """An array stored as the elements that differ from a base array of the same dtype (all of them past its end)"""
+    __slots__ = ("shape", "index", "values")
+
+    @classmethod
+    def encode(cls, base, array):
+        """ArrayDelta of array against base, or array itself when the delta would not be smaller"""
+        flat_base, flat = base.reshape(-1), array.reshape(-1)
+        common = min(len(flat_base), len(flat))
+        bits = f"u{array.dtype.itemsize}"  # Compare bit patterns, so NaN equals NaN
+        changed = np.flatnonzero(flat_base[:common].view(bits) != flat[:common].view(bits))
+        index = np.concatenate((changed, np.arange(common, len(flat)))).astype(np.uint32)
+        if index.nbytes + len(index) * array.dtype.itemsize >= array.nbytes:
+            return array
+        delta = cls()
+        delta.shape = array.shape
+        delta.index = index
+        delta.values = flat[index]
+        return delta
+
+    def apply(self, base):
+        flat = np.empty(math.prod(self.shape), dtype=self.values.dtype)
+        common = min(base.size, flat.size)
+        flat[:common] = base.reshape(-1)[:common]
+        flat[self.index] = self.values
+        return flat.reshape(self.shape)
+
+
+class ContainerDelta:
+    """A dict or list of capture_state() values, each encoded against the matching base value"""
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+def encode_delta(base, value):
+    """value (a capture_state() or part of it) encoded against base; apply_delta(base, ...) gives value back"""
+    if isinstance(value, np.ndarray):
+        if isinstance(base, np.ndarray) and base.dtype == value.dtype and base.shape[1:] == value.shape[1:]:
+            return ArrayDelta.encode(base, value)
+        return value
+    if isinstance(value, dict) and isinstance(base, dict):
+        return ContainerDelta({key: encode_delta(base.get(key), item) for key, item in value.items()})
+    if isinstance(value, list) and isinstance(base, list) and len(value) == len(base):
+        return ContainerDelta([encode_delta(base_item, item) for base_item, item in zip(base, value)])
+    return value
+
+
+def apply_delta(base, encoded):
+    if isinstance(encoded, ArrayDelta):
+        return encoded.apply(base)
+    if isinstance(encoded, ContainerDelta):
+        if isinstance(encoded.items, dict):
+            return {key: apply_delta(base.get(key), item) for key, item in encoded.items.items()}
+        return [apply_delta(base_item, item) for base_item, item in zip(base, encoded.items)]
+    return encoded
+
+
+def state_nbytes(value):
+    """Approximate memory held by the arrays of a (delta-encoded) state"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, ArrayDelta):
+        return value.index.nbytes + value.values.nbytes
+    if isinstance(value, ContainerDelta):
+        value = value.items
+    if isinstance(value, dict):
+        return sum(state_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(state_nbytes(item) for item in value)
+    return 0
+
+
+class StateTimeline:
+    """Snapshots of one simulation day every `interval` minutes, to seek back (and forward) within it
+
+    Every `keyframe_every`-th snapshot holds the full Simulation.capture_state() except the append-only
+    parts; the ones in between only hold what changed since the previous snapshot, so any snapshot is
+    restored from one keyframe and fewer than `keyframe_every` deltas, and a seek replays at most
+    `interval` minutes, however late in the day it lands. The append-only parts (occupancy and seated
+    columns, per-train waiting times) are kept once, as the segment each snapshot added to them.
+    """
+    APPENDED = ("occupancy", "seated", "waiting_times")
+
+    def __init__(self, simulation, interval=SNAPSHOT_INTERVAL, keyframe_every=SNAPSHOT_KEYFRAME_EVERY):
+        self.simulation = simulation
+        self.interval = interval
+        self.keyframe_every = keyframe_every
+        self.start_time = simulation.start_time
+        self.snapshots = {}  # Snapshot number -> capture_state() without APPENDED (keyframes) or its ContainerDelta
+        self.segments = {}   # Snapshot number -> first occupancy column and APPENDED written since the previous one
+        self.latest = None   # (number, snapshot, APPENDED) of the last recorded snapshot, to encode the next delta
+
+    def snapshot_time(self, number):
+        return self.start_time + number * self.interval
+
+    def record(self):
+        """Snapshot the simulation if it is at a snapshot minute not recorded yet; call before each update()"""
+        offset = self.simulation.current_time - self.start_time
+        if offset % self.interval or offset // self.interval in self.snapshots:
+            return False
+        number = offset // self.interval
+        state = self.simulation.capture_state()
+        appended = {name: state.pop(name) for name in self.APPENDED}
+        # Occupancy columns before the current minute are final and the later ones still NaN
+        appended["occupancy"] = appended["occupancy"][:, :offset]
+        appended["seated"] = appended["seated"][:, :offset]
+        segment = dict(appended, since=0)
+        if number - 1 in self.snapshots:
+            if self.latest is not None and self.latest[0] == number - 1:
+                _, previous, previous_appended = self.latest
+            else:
+                previous, previous_appended = self.snapshot(number - 1), self.appended(number - 1)
+            segment["since"] = since = previous_appended["occupancy"].shape[1]
+            segment["occupancy"] = appended["occupancy"][:, since:]
+            segment["seated"] = appended["seated"][:, since:]
+            if appended["waiting_times"] is not None:
+                segment["waiting_times"] = {
+                    train_id: times[len(previous_appended["waiting_times"].get(train_id, ())):]
+                    for train_id, times in appended["waiting_times"].items()}
+        self.segments[number] = segment
+        if number % self.keyframe_every and number - 1 in self.snapshots:
+            self.snapshots[number] = encode_delta(previous, state)
+        else:
+            self.snapshots[number] = state
+        self.latest = (number, state, appended)
+        return True
+
+    def snapshot(self, number):
+        """capture_state() without APPENDED of a recorded snapshot: its keyframe with the deltas up to it applied"""
+        chain = [number]
+        while isinstance(self.snapshots[chain[-1]], ContainerDelta):
+            chain.append(chain[-1] - 1)
+        state = self.snapshots[chain.pop()]
+        for entry in reversed(chain):
+            state = apply_delta(state, self.snapshots[entry])
+        return state
+
+    def appended(self, number):
+        """APPENDED of a recorded snapshot, joined from the segments up to it (occupancy up to its minute)"""
+        first = number
+        while self.segments[first]["since"]:
+            first -= 1
+        segments = [self.segments[n] for n in range(first, number + 1)]
+        appended = {name: np.concatenate([segment[name] for segment in segments], axis=1)
+                    for name in ("occupancy", "seated")}
+        # The last segment lists every train, in the order they were first added
+        appended["waiting_times"] = None if segments[-1]["waiting_times"] is None else {
+            train_id: np.concatenate([segment["waiting_times"][train_id] for segment in segments
+                                      if train_id in segment["waiting_times"]])
+            for train_id in segments[-1]["waiting_times"]}
+        return appended
+
+    def state(self, number):
+        """Full capture_state() of a recorded snapshot"""
+        state = dict(self.snapshot(number))
+        appended = self.appended(number)
+        written = appended["occupancy"].shape[1]
+        for name in ("occupancy", "seated"):
+            array = np.full(getattr(self.simulation.occupancy, name).shape, np.nan, dtype=np.float32)
+            array[:, :written] = appended[name]
+            state[name] = array
+        state["waiting_times"] = appended["waiting_times"]
+        return state
+
+    def seek(self, minute):
+        """Bring the simulation to the start of `minute` and return the minute reached (earlier if the day ends first)
+
+        Restores the last snapshot at or before `minute`, unless the simulation already sits between
+        it and `minute`, then replays forward, recording any snapshots passed on the way.
+        """
+        simulation = self.simulation
+        minute = max(self.start_time, min(minute, simulation.end_time))
+        number = max((number for number in self.snapshots if self.snapshot_time(number) <= minute), default=None)
+        if number is not None and not self.snapshot_time(number) <= simulation.current_time <= minute:
+            simulation.restore_state(self.state(number))
+        while simulation.current_time < minute and not simulation.is_complete():
+            self.record()
+            simulation.update()
+        self.record()
+        return simulation.current_time
+
+    def nbytes(self):
+        return state_nbytes(list(self.snapshots.values()) + list(self.segments.values()))
+
+
+class Simulation:
+    def __init__(self, engine=TICK_ENGINE, debug=False, arrivals=ONLINE_ARRIVALS, rng=None, schedule=None,
+                 profile=False, occupancy_directory=None, event_log=None, bounded_memory=False, rates=None,
+                 scenario=None):
+        if engine not in (TICK_ENGINE, EVENT_ENGINE):
+            raise ValueError(f"Unknown engine {engine!r}, expected {TICK_ENGINE!r} or {EVENT_ENGINE!r}")
+        if arrivals not in (ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS):
+            raise ValueError(f"Unknown arrivals mode {arrivals!r}, expected {ONLINE_ARRIVALS!r} or {PRESAMPLED_ARRIVALS!r}")
+        self.engine = engine
+        self.arrivals = arrivals
+        self.debug = debug  # Check the incremental passenger counters against a full recount every step
+        self.profiler = Profiler() if profile else None  # Per-phase timings and gauges, None when off
+        self.event_log = event_log  # EventSink receiving passenger lifecycle events, None when off
+        self.bounded_memory = bounded_memory
+        # Compiled krl_scenario.Scenario replacing TRAIN_SCHEDULE, PASSENGER_RATES, DESTINATION_PROBS and SEATED_CAPACITY
+        self.scenario = scenario
+        if scenario is not None:
+            scenario.check_line()
+        self.seated_capacity = SEATED_CAPACITY if scenario is None else scenario.seated_capacity
+        self.occupancy_directory = occupancy_directory
+        self.rng = rng if isinstance(rng, RandomStreams) else RandomStreams(rng)  # A RandomStreams or a seed
+        self.end_time = MAX_SIMULATION_TIME
+        self.clock_speed = SIMULATION_SPEED
+        self.passengers = PassengerStore()
+        self.train_pool = []  # Train objects, reused by later days
+        self.station_queues = {station_name: deque() for station_name, _ in STATIONS}  # Waiting passengers in arrival order
+        destination_probs = destination_matrix() if scenario is None else scenario.destinations
+        self.destination_cdf = np.cumsum(destination_probs, axis=1)
+        self.destination_cdf_rows = self.destination_cdf.tolist()  # For bisect on single draws
+        # Last reachable destination per origin (guards against rounding in the CDF), None if there are none
+        self.last_destination = [int(np.flatnonzero(row)[-1]) if row.any() else None for row in destination_probs]
+        self.state_version = 0  # Bumped on every step; invalidates the cached result tables
+        self.results_cache = None
+        self.tick_phases = [
+            (GENERATION_PHASE, self.generate_arrivals_tick),
+            (TRAINS_PHASE, self.advance_trains_tick),
+            (GIVE_UP_PHASE, self.expire_all_waiting_passengers),
+        ]
+        if self.debug:
+            self.tick_phases.append((STATS_CHECK_PHASE, self.check_passenger_stats))
+        self.tick_phases.append((OCCUPANCY_PHASE, self.record_all_occupancy))
+        self.day = 0
+        self.start_day(0, schedule, rates)
+
+    def start_day(self, day, schedule=None, rates=None):
+        """(Re)start the simulation at the beginning of a day, reusing trains, passenger store and buffers
+
+        schedule defaults to TRAIN_SCHEDULE and rates (hour x station passengers per minute) to
+        PASSENGER_RATES, or to those of the scenario. The last train leaves long before the next day's first one and nobody waits
+        longer than PASSENGER_GIVE_UP_WAIT_TIME, so no passenger carries over between days: the
+        previous day's results must be read before calling this.
+        """
+        self.day = day
+        self.rng.start_day(day)
+        if self.scenario is not None:
+            schedule = schedule or self.scenario.schedule
+            rates = self.scenario.rates if rates is None else rates
+        self.schedule = sorted(schedule or TRAIN_SCHEDULE)  # (departure time, capacity) per train
+        self.rates = passenger_rate_matrix() if rates is None else np.asarray(rates, dtype=np.float64)
+        self.rate_rows = self.rates.tolist()  # For scalar lookups
+        self.service_end_time = self.schedule[-1][0] + LAST_TRAIN_BUFFER  # 30 minutes after the last train
+        self.start_time = self.schedule[0][0] - 60  # Start 1 hour before first train
+        self.current_time = self.start_time
+        self.passengers.clear()
+        for queue in self.station_queues.values():
+            queue.clear()
+        self.initialize_trains()
+        self.trains_running = len(self.trains)
+        self.timetable = Timetable(self.schedule)
+        # Bounded-memory mode: completed passengers and those who gave up are folded into these tables
+        # and their PassengerStore rows reused, so memory no longer grows with simulated time
+        self.retired = ResultTables(self.passengers, len(self.trains), rows=np.zeros(0, dtype=np.int64)) if self.bounded_memory else None
+        # Per-minute occupancy samples; memory-mapped files in occupancy_directory for long runs
+        # (rewritten every day: save or copy them before starting the next one)
+        occupancy = getattr(self, "occupancy", None)
+        if occupancy is not None and occupancy.occupancy.shape[0] == len(self.trains) and occupancy.start_time == self.start_time:
+            occupancy.occupancy[:] = np.nan
+            occupancy.seated[:] = np.nan
+        else:
+            self.occupancy = OccupancySeries(len(self.trains), self.start_time, self.end_time, self.occupancy_directory)
+        # Passenger counters are kept up to date as passengers board, get a seat, alight and give up
+        self.stats = {
+            "passengers_generated": 0,
+            "passengers_completed": 0,
+            "passengers_seated": 0,     # Currently on board and seated
+            "passengers_standing": 0,   # Currently on board and standing
+            "passengers_gave_up": 0,
+            "train_occupancy": self.occupancy.occupancy,    # train x minute (see self.occupancy)
+            "seated_percentage": self.occupancy.seated,
+            "waiting_times": None if self.bounded_memory else defaultdict(list),  # See ResultTables.waiting_time_histogram
+        }
+        self.arrival_stream = self.sample_arrival_stream() if self.arrivals == PRESAMPLED_ARRIVALS else None
+        if self.arrival_stream is None and self.rng.common_random_numbers:
+            self.skip_arrival_draws(self.start_time)
+        self.state_version += 1
+        if self.engine == EVENT_ENGINE:
+            self.initialize_events()
+    
+    def initialize_trains(self):
+        while len(self.train_pool) < len(self.schedule):
+            self.train_pool.append(Train(len(self.train_pool), 0, TRAIN_CAPACITY, self.seated_capacity, self))
+        self.trains = self.train_pool[:len(self.schedule)]
+        for train, (departure_time, capacity) in zip(self.trains, self.schedule):
+            train.reset(departure_time, capacity)
+    
+    def generate_passenger(self, station, current_hour):
+        """Create a passenger at a station with a random destination; returns its index in self.passengers"""
+        origin = station
+        
+        # Only generate if there are valid destinations
+        # Determine destination based on origin probabilities
+        destination = self.draw_destination(STATION_INDEX[origin])
+        if destination is None:
+            return None
+        
+        # Create passenger
+        passenger = self.passengers.add(
+            STATION_INDEX[origin],
+            destination,
+            self.current_time
+        )
+        self.station_queues[origin].append(passenger)
+        self.stats["passengers_generated"] += 1
+        if self.event_log is not None:
+            self.event_log.emit(ARRIVAL_LOG_EVENT, self.passengers.arrival_time[passenger].item(),
+                                int(self.passengers.serial[passenger]), STATION_INDEX[origin], -1, destination)
+        
+        return passenger
+
+    def draw_destination(self, station_idx):
+        """Destination station index for one new passenger at a station, None if the station has no destinations"""
+        last_destination = self.last_destination[station_idx]
+        if last_destination is None:
+            return None
+        u = self.rng.destinations[station_idx].random()
+        return min(bisect.bisect_right(self.destination_cdf_rows[station_idx], u), last_destination)
+
+    def draw_destinations(self, station_idx, count):
+        """Vectorized draw_destination for count passengers (consumes the same draws)"""
+        u = self.rng.destinations[station_idx].random(count)
+        destinations = np.searchsorted(self.destination_cdf[station_idx], u, side="right")
+        return np.minimum(destinations, self.last_destination[station_idx]).astype(np.int8)
+
+    def draw_arrivals(self, minute):
+        """Online arrivals of one minute for the event engine as (origins, destinations), drawn like generate_arrivals_tick"""
+        rates = self.rate_rows[(minute // 60) % 24]
+        common_random_numbers = self.rng.common_random_numbers
+        origins, destinations = [], []
+        for station_idx, has_upcoming_train in enumerate(self.generating_rows[minute]):
+            if has_upcoming_train or common_random_numbers:
+                count = self.rng.arrivals[station_idx].poisson(rates[station_idx])
+                if count and self.last_destination[station_idx] is not None:
+                    drawn = [self.draw_destination(station_idx) for _ in range(count)]  # Discarded without a train due
+                    if has_upcoming_train:
+                        origins += [station_idx] * count
+                        destinations += drawn
+        return np.array(origins, dtype=np.int8), np.array(destinations, dtype=np.int8)
+
+    def skip_arrival_draws(self, until):
+        """Common random numbers: consume the arrival draws of every minute before `until`, as if simulated from 00:00"""
+        minutes = np.arange(0, until)
+        rates = self.rates[(minutes // 60) % 24]
+        for station_idx in range(len(STATIONS)):
+            arrivals = int(self.rng.arrivals[station_idx].poisson(rates[:, station_idx]).sum())
+            if self.last_destination[station_idx] is not None:
+                self.rng.destinations[station_idx].random(arrivals)
+
+    def sample_arrival_stream(self):
+        """Sample every arrival of the day at once, applying the same filters as the online generation"""
+        # Draws always start at 00:00 and cover filtered-out minutes too, so every schedule sees the same stream
+        minutes = np.arange(0, self.end_time)
+        rates = self.rates[(minutes // 60) % 24]  # minute x station
+
+        # A train counts as upcoming for station s at minute t until the tick in which it stops there
+        has_upcoming_train = self.timetable.upcoming_mask(minutes, UPCOMING_TRAIN_CHECK_WINDOW)  # minute x station
+        in_service_hours = (minutes >= self.start_time) & (minutes <= self.service_end_time)
+
+        has_destinations = np.array([last is not None for last in self.last_destination])
+        generating = has_upcoming_train & in_service_hours[:, None] & has_destinations[None, :]
+        all_counts = np.column_stack([self.rng.arrivals[idx].poisson(rates[:, idx]) for idx in range(len(STATIONS))])
+        counts = np.where(generating, all_counts, 0)
+
+        # Arrivals ordered by minute, then station; destinations in one categorical draw per origin
+        station_indices = np.arange(len(STATIONS), dtype=np.int8)
+        origin = np.repeat(np.tile(station_indices, len(minutes)), counts.ravel())
+        destination = np.zeros(len(origin), dtype=np.int8)
+        for station_idx in np.flatnonzero(has_destinations):
+            station_counts = all_counts[:, station_idx]
+            kept = np.repeat(generating[:, station_idx], station_counts)
+            destination[origin == station_idx] = self.draw_destinations(station_idx, int(station_counts.sum()))[kept]
+        start = self.start_time
+        return ArrivalStream(start, counts[start:], origin, destination)
+
+    def add_arrivals(self, arrival_time, origins, destinations):
+        """Queue a batch of passengers arriving at the same time, grouped by origin station (as ArrivalStream
+        and draw_arrivals give them); returns the stations they arrived at"""
+        if not len(origins):
+            return []
+        indices = self.passengers.add_many(origins, destinations, arrival_time)
+        if self.event_log is not None:
+            self.event_log.emit_arrivals(arrival_time, self.passengers.serial[indices], origins, destinations)
+        counts = np.bincount(origins, minlength=len(STATIONS)).tolist()
+        indices = indices.tolist()
+        stations = []
+        start = 0
+        for station_idx, count in enumerate(counts):
+            if count:
+                self.station_queues[STATIONS[station_idx][0]].extend(indices[start:start + count])
+                stations.append(station_idx)
+                start += count
+        self.stats["passengers_generated"] += len(origins)
+        return stations
+
+    def station_has_upcoming_train(self, station_idx, time):
+        """Whether passengers still turn up at a station: a train is due within the check window and service hasn't ended"""
+        # Also check if we're still in service hours (before last train + buffer)
+        if time > self.service_end_time:
+            return False
+
+        # The next train still to stop here is the earliest one, so it alone decides (within 2 hours)
+        next_arrival = self.timetable.next_arrival(station_idx, time, tick=self.engine == TICK_ENGINE)
+        return next_arrival is not None and next_arrival - time <= UPCOMING_TRAIN_CHECK_WINDOW
+
+    def service_train(self, train, arrival_time_at_this_station, boarding_time):
+        """Alight and board passengers at the train's current station, then send it on to the next one"""
+        # 1. Passengers alight
+        # No alighting at the origin station on initial departure
+        if not (train.current_station_idx == 0 and arrival_time_at_this_station == train.departure_time):
+            train._alight_passengers_at_current_station()
+        
+        # 2. Passengers board
+        station_name = train.get_current_station()
+        train.board_passengers(self.station_queues[station_name], boarding_time)
+        
+        # 3. Train prepares for travel to the next station
+        train._prepare_for_travel_to_next_station(arrival_time_at_this_station)
+        if train.completed:
+            self.trains_running -= 1
+            if self.retired is not None:
+                train.standing_queue.clear()
+                self.passengers.release(train.held_passengers)
+                train.held_passengers = []
+
+    def expire_waiting_passengers(self, queue, latest_arrival_time, time):
+        """Passengers who arrived at or before latest_arrival_time give up at `time`; they are always at the head of the queue"""
+        arrival_times = self.passengers.arrival_time
+        state = self.passengers.state
+        gave_up = []
+        while queue and arrival_times[queue[0]] <= latest_arrival_time:
+            passenger = queue.popleft()
+            state[passenger] ^= WAITING # Passenger gives up (queued passengers always have WAITING set)
+            self.stats["passengers_gave_up"] += 1
+            gave_up.append(passenger)
+            if self.event_log is not None:
+                self.event_log.emit(GIVE_UP_LOG_EVENT, time, int(self.passengers.serial[passenger]),
+                                    int(self.passengers.origin[passenger]))
+        if gave_up and self.retired is not None:
+            self.retire_passengers(gave_up)
+
+    def retire_passengers(self, passengers, release=True):
+        """Fold finished passengers into the retired tables; release=False keeps their rows until release_passengers()"""
+        self.retired.add(ResultTables(self.passengers, len(self.trains), rows=np.array(passengers, dtype=np.int64)))
+        if release:
+            self.passengers.release(passengers)
+        else:
+            self.passengers.state[passengers] |= RETIRED
+
+    def recount_passenger_stats(self):
+        """Count passenger states by scanning every passenger (slow, used to check the incremental counters)"""
+        live = self.passengers.live()
+        state = self.passengers.column("state")[live]
+        completed = (state & COMPLETED) != 0
+        on_board = ~completed & (self.passengers.column("train_id")[live] >= 0)
+        seated = (state & SEATED) != 0
+        gave_up = ~completed & ~on_board & ((state & WAITING) == 0)
+        retired_completed = int(self.retired.completed.sum()) if self.retired is not None else 0
+        retired_gave_up = int(self.retired.gave_up.sum()) if self.retired is not None else 0
+        return {
+            "passengers_completed": int(completed.sum()) + retired_completed,
+            "passengers_seated": int((on_board & seated).sum()),
+            "passengers_standing": int((on_board & ~seated).sum()),
+            "passengers_gave_up": int(gave_up.sum()) + retired_gave_up,
+        }
+
+    def check_passenger_stats(self):
+        counts = self.recount_passenger_stats()
+        mismatched = {key: (self.stats[key], count) for key, count in counts.items() if self.stats[key] != count}
+        if mismatched:
+            raise AssertionError(f"Passenger counters out of sync at {self.current_time} (counter, recount): {mismatched}")
+
+    def record_train_occupancy(self, train, time, until=None):
+        """Sample the train's occupancy for the minute `time` (or every minute in [time, until))"""
+        total_passengers = train.passenger_count
+        seated_passengers = train.seated_count
+        
+        occupancy_percentage = (total_passengers / train.capacity) * 100
+        seated_percentage = (seated_passengers / train.seated_capacity) * 100 if seated_passengers > 0 else 0
+        
+        self.occupancy.record(train.id, time, time + 1 if until is None else until, occupancy_percentage, seated_percentage)
+
+    def is_complete(self):
+        return self.current_time >= self.end_time or self.trains_running == 0
+
+    def capture_state(self):
+        """Everything update() changes, as plain values and array copies, taken between two updates
+
+        restore_state() on a simulation of the same day (engine, schedule, rates and seed) carries on
+        from here exactly as this one would. The day's inputs (schedule, rates, presampled arrival
+        stream) are not included and an event log is not rewound.
+        """
+        waiting_times = self.stats["waiting_times"]
+        state = {
+            "engine": self.engine,
+            "day": self.day,
+            "current_time": self.current_time,
+            "trains_running": self.trains_running,
+            "passengers": self.passengers.capture_state(),
+            "station_queues": [np.array(self.station_queues[name], dtype=np.int64) for name, _ in STATIONS],
+            "trains": [train.capture_state() for train in self.trains],
+            "stats": {key: value for key, value in self.stats.items() if isinstance(value, int)},
+            # Per-train waiting times only ever grow, so a StateTimeline keeps just the new tail per snapshot
+            "waiting_times": None if waiting_times is None else {
+                train_id: np.array(times, dtype=np.float64) for train_id, times in waiting_times.items()},
+            "occupancy": self.occupancy.occupancy.copy(),
+            "seated": self.occupancy.seated.copy(),
+            "retired": None if self.retired is None else {
+                name: getattr(self.retired, name).copy() for name in ResultTables.TABLES},
+            "rng": [generator.bit_generator.state for generator in self.rng.arrivals + self.rng.destinations],
+        }
+        if self.engine == EVENT_ENGINE:
+            counter = next(self.event_counter)
+            self.event_counter = itertools.count(counter)  # Put back the value just taken
+            state["events"] = [(time, kind, order, payload.id if kind in (TRAIN_DEPARTURE_EVENT, TRAIN_ARRIVAL_EVENT) else payload)
+                               for time, kind, order, payload in self.events]
+            state["event_counter"] = counter
+            state["next_sample_time"] = dict(self.next_sample_time)
+        return state
+
+    def restore_state(self, state):
+        """Continue from a capture_state() of this simulation, or of one set up for the same day"""
+        if state["engine"] != self.engine or state["day"] != self.day or len(state["trains"]) != len(self.trains):
+            raise ValueError(f"State of day {state['day']} ({state['engine']} engine, {len(state['trains'])} trains) "
+                             f"does not fit day {self.day} ({self.engine} engine, {len(self.trains)} trains)")
+        self.current_time = state["current_time"]
+        self.trains_running = state["trains_running"]
+        self.passengers.restore_state(state["passengers"])
+        for (station_name, _), queue in zip(STATIONS, state["station_queues"]):
+            self.station_queues[station_name].clear()
+            self.station_queues[station_name].extend(queue.tolist())
+        for train, train_state in zip(self.trains, state["trains"]):
+            train.restore_state(train_state)
+        self.stats.update(state["stats"])
+        if state["waiting_times"] is not None:
+            self.stats["waiting_times"] = defaultdict(list, {
+                train_id: times.tolist() for train_id, times in state["waiting_times"].items()})
+        self.occupancy.occupancy[:] = state["occupancy"]
+        self.occupancy.seated[:] = state["seated"]
+        if state["retired"] is not None:
+            for name, table in state["retired"].items():
+                getattr(self.retired, name)[...] = table
+        for generator, rng_state in zip(self.rng.arrivals + self.rng.destinations, state["rng"]):
+            generator.bit_generator.state = rng_state
+        if self.engine == EVENT_ENGINE:
+            # Same list order as captured, so it is still a valid heap
+            self.events = [(time, kind, order, self.trains[payload] if kind in (TRAIN_DEPARTURE_EVENT, TRAIN_ARRIVAL_EVENT) else payload)
+                           for time, kind, order, payload in state["events"]]
+            self.event_counter = itertools.count(state["event_counter"])
+            self.next_sample_time = dict(state["next_sample_time"])
+        self.state_version += 1
+
+    def update(self):
+        """Advance the simulation by one minute; returns True once the simulation is complete"""
+        self.state_version += 1
+        if self.engine == EVENT_ENGINE:
+            return self.update_events()
+        return self.update_tick()
+
+    def update_tick(self):
+        if self.profiler is None:
+            for _, phase in self.tick_phases:
+                phase()
+        else:
+            for name, phase in self.tick_phases:
+                self.profiler.measure(name, phase)
+            self.profiler.sample_gauges(self, self.current_time)
+
+        # Advance time
+        self.current_time += 1
+        
+        # Check if simulation is complete
+        return self.is_complete()
+
+    def generate_arrivals_tick(self):
+        # Generate passengers at stations based on time of day
+        current_hour = (self.current_time // 60) % 24
+        
+        if self.arrival_stream is not None:
+            # Whole-day arrivals were sampled up front, with the same service-window filters
+            self.add_arrivals(self.current_time, *self.arrival_stream.arrivals_at(self.current_time))
+        else:
+            # Generate passengers only if there are upcoming trains within reasonable time (2 hours)
+            # (with common random numbers the draws are made, and discarded, either way)
+            common_random_numbers = self.rng.common_random_numbers
+            for station_idx, (station_name, _) in enumerate(STATIONS):
+                has_upcoming_train = self.station_has_upcoming_train(station_idx, self.current_time)
+                if has_upcoming_train or common_random_numbers:
+                    # Get hourly rate for this station
+                    rate = self.rate_rows[current_hour][station_idx]
+                    
+                    # Use Poisson distribution to determine number of new passengers
+                    num_new_passengers = self.rng.arrivals[station_idx].poisson(rate)
+                    
+                    for _ in range(num_new_passengers):
+                        if has_upcoming_train:
+                            self.generate_passenger(station_name, current_hour)
+                        else:
+                            self.draw_destination(station_idx)
+
+    def advance_trains_tick(self):
+        # Update trains
+        for train in self.trains:
+            if train.completed:
+                continue
+
+            # Handle initial departure from origin
+            if self.current_time < train.departure_time and train.current_station_idx == 0 : # Check if it's still before initial departure
+                continue
+            
+            # train.next_station_time is arrival at STATIONS[train.current_station_idx]
+            # or initial departure_time if at origin
+            if self.current_time >= train.next_station_time:
+                # Boarding uses self.current_time for passenger.boarding_time
+                self.service_train(train, train.next_station_time, self.current_time)
+
+    def expire_all_waiting_passengers(self):
+        # Remove passengers who have been waiting more than PASSENGER_GIVE_UP_WAIT_TIME
+        for queue in self.station_queues.values():
+            self.expire_waiting_passengers(queue, self.current_time - PASSENGER_GIVE_UP_WAIT_TIME - 1, self.current_time)
+
+    def record_all_occupancy(self):
+        # Record train occupancy data
+        for train in self.trains:
+            if not train.completed and self.current_time >= train.departure_time:
+                self.record_train_occupancy(train, self.current_time)
+
+    # Discrete-event engine: only does work at minutes with passenger arrivals, train stops and
+    # give-ups, instead of scanning every train, station and passenger once per simulated minute.
+    # Arrivals are handled as one batch per minute and give-ups as one event per station and
+    # arrival minute, so the heap holds a few thousand events a day rather than two per passenger
+
+    def initialize_events(self):
+        self.events = []
+        self.event_counter = itertools.count()  # Tie-breaker keeps same-time events in scheduling order
+        self.next_sample_time = {train.id: train.departure_time for train in self.trains}
+        for train in self.trains:
+            self.schedule_event(train.departure_time, TRAIN_DEPARTURE_EVENT, train)
+        if self.arrival_stream is None:
+            # minute x station: station_has_upcoming_train for every minute of the day, for draw_arrivals
+            minutes = np.arange(0, self.end_time)
+            generating = self.timetable.upcoming_mask(minutes, UPCOMING_TRAIN_CHECK_WINDOW, tick=False)
+            generating &= (minutes <= self.service_end_time)[:, None]
+            self.generating_rows = generating.tolist()
+            self.generating_minutes = np.flatnonzero(generating.any(axis=1))
+        self.schedule_next_arrivals(self.current_time)
+
+    def schedule_event(self, time, kind, payload):
+        heapq.heappush(self.events, (time, kind, next(self.event_counter), payload))
+
+    def schedule_give_up(self, station_name, arrival_time):
+        """Passengers who arrived at arrival_time give up if still queued PASSENGER_GIVE_UP_WAIT_TIME + 1 minutes
+        later: the tick engine still lets them board in tick arrival_time + PASSENGER_GIVE_UP_WAIT_TIME"""
+        self.schedule_event(arrival_time + PASSENGER_GIVE_UP_WAIT_TIME + 1, GIVE_UP_EVENT, (station_name, arrival_time))
+
+    def schedule_next_arrivals(self, minute):
+        """Schedule the arrivals of the next minute at or after `minute` in which passengers may turn up"""
+        if self.arrival_stream is not None:
+            minute = self.arrival_stream.next_arrival_minute(minute)
+        elif not self.rng.common_random_numbers:
+            # Skip ahead while no station has a train due (common random numbers make every minute's draws)
+            i = np.searchsorted(self.generating_minutes, minute)
+            minute = int(self.generating_minutes[i]) if i < len(self.generating_minutes) else None
+        if minute is not None and minute < self.end_time:
+            self.schedule_event(minute, PASSENGER_ARRIVAL_EVENT, None)
+
+    def flush_occupancy_samples(self, train, until):
+        """Record the per-minute occupancy samples the tick engine would have taken before `until`"""
+        minute = self.next_sample_time[train.id]
+        if minute < until:
+            # Occupancy only changes at train stops, so all these minutes share one sample
+            self.record_train_occupancy(train, minute, until)
+            self.next_sample_time[train.id] = until
+
+    def handle_event(self, time, kind, payload):
+        if kind == PASSENGER_ARRIVAL_EVENT:
+            # The presampled stream's arrivals of this minute, or this minute's online draws
+            arrivals = self.arrival_stream.arrivals_at(time) if self.arrival_stream is not None else self.draw_arrivals(time)
+            for station_idx in self.add_arrivals(time, *arrivals):
+                self.schedule_give_up(STATIONS[station_idx][0], time)
+            self.schedule_next_arrivals(time + 1)
+
+        elif kind in (TRAIN_DEPARTURE_EVENT, TRAIN_ARRIVAL_EVENT):
+            train = payload
+            # Minutes before this stop saw the occupancy from before it
+            self.flush_occupancy_samples(train, math.ceil(time))
+            self.service_train(train, time, time)
+            if not train.completed:
+                self.schedule_event(train.next_station_time, TRAIN_ARRIVAL_EVENT, train)
+
+        elif kind == GIVE_UP_EVENT:
+            # Everyone who arrived at the station up to the given time and is still queued gives up
+            station_name, latest_arrival_time = payload
+            self.expire_waiting_passengers(self.station_queues[station_name], latest_arrival_time, time)
+
+    def process_events(self, until):
+        """Handle all events up to and including `until`; returns the time of the last one handled"""
+        last_time = None
+        profiler = self.profiler
+        while self.events and self.events[0][0] <= until and self.trains_running > 0:
+            time, kind, _, payload = heapq.heappop(self.events)
+            if profiler is None:
+                self.handle_event(time, kind, payload)
+            else:
+                profiler.measure(EVENT_PHASES[kind], self.handle_event, time, kind, payload)
+                if EVENT_PHASES[kind] == TRAINS_PHASE:
+                    profiler.sample_gauges(self, time)
+            last_time = time
+        return last_time
+
+    def run_phase(self, phase, function, *args):
+        """Call function, timed under the given phase when profiling"""
+        if self.profiler is None:
+            return function(*args)
+        return self.profiler.measure(phase, function, *args)
+
+    def flush_all_occupancy_samples(self, until):
+        for train in self.trains:
+            if not train.completed:
+                self.flush_occupancy_samples(train, until)
+
+    def update_events(self):
+        self.process_events(self.current_time)
+        self.run_phase(OCCUPANCY_PHASE, self.flush_all_occupancy_samples, self.current_time + 1)
+        if self.debug:
+            self.run_phase(STATS_CHECK_PHASE, self.check_passenger_stats)
+        self.current_time += 1
+        return self.is_complete()
+
+    def run(self):
+        """Run the whole day without a display and return get_results()"""
+        if self.engine == EVENT_ENGINE:
+            self.state_version += 1
+            # Same last tick as the tick engine: the one in which the last train finished, or end_time
+            last_time = self.process_events(self.end_time - 1)
+            if self.trains_running == 0 and last_time is not None:
+                self.current_time = max(self.current_time, min(self.end_time, math.ceil(last_time) + 1))
+            else:
+                self.current_time = self.end_time
+            self.run_phase(OCCUPANCY_PHASE, self.flush_all_occupancy_samples, self.current_time)
+            if self.debug:
+                self.run_phase(STATS_CHECK_PHASE, self.check_passenger_stats)
+        else:
+            while not self.update():
+                pass
+        return self.get_results()
+    
+    def result_tables(self):
+        """Grouped passenger outcome tables, cached until the simulation state changes"""
+        if self.results_cache is None or self.results_cache[0] != self.state_version:
+            tables = ResultTables(self.passengers, len(self.trains), retired=self.retired)
+            self.results_cache = (self.state_version, tables, None)
+        return self.results_cache[1]
+
+    def get_results(self):
+        tables = self.result_tables()
+        if self.results_cache[2] is None:
+            results = {
+                "passengers_generated": self.stats["passengers_generated"],
+                "passengers_completed": self.stats["passengers_completed"],
+                "passengers_seated": self.stats["passengers_seated"],
+                "passengers_standing": self.stats["passengers_standing"],
+                "passengers_gave_up": self.stats["passengers_gave_up"],
+                "avg_waiting_times": tables.avg_waiting_times(),
+                "seat_probability": tables.seat_probability(),
+                "seat_probability_yogya": tables.seat_probability("YK"),
+                "occupancy_minutes": self.occupancy.minutes,  # Minute of each column of the arrays below
+                "occupancy_data": self.occupancy.occupancy,  # train x minute, NaN where the train wasn't running
+                "seated_percentage": self.occupancy.seated
+            }
+            self.results_cache = (self.state_version, tables, results)
+        return self.results_cache[2]
+    
+    def calculate_avg_waiting_times(self):
+        return self.result_tables().avg_waiting_times()
+    
+    def calculate_seat_probability(self):
+        return self.result_tables().seat_probability()
+    
+    def calculate_seat_probability_by_origin(self, origin_station="YK"):
+        """Calculate seat probability for passengers from specific origin station"""
+        return self.result_tables().seat_probability(origin_station)
@@ -0,0 +1,285 @@
+"""Analytic fluid-flow estimate of a simulated day: expected values instead of random passengers.
+
+Passengers are treated as a continuous flow. Each station's queue holds the expected number of
+waiting passengers per arrival minute, and each train carries expected seated and standing
+loads per (origin, destination). Trains are run in departure order through the same rules as
+the tick engine:
+- arrivals are gated by the timetable and service hours
+- boarding is FIFO up to the capacity, filling seats first
+- seats freed by alighting passengers go to standing passengers in boarding order
+- passengers give up after PASSENGER_GIVE_UP_WAIT_TIME
+
+A day takes milliseconds, so this works for what-if exploration and as a cheap pre-filter in
+schedule search (krl_optimizer --prefilter). It is still an approximation, because the expected
+value of a capacity-limited process is not the process of the expected values; the gap is widest
+for trains that are only sometimes full. Compare the two with validate() or the CLI.
+
+Usage:
+    python krl_fluid.py                                   # per-train estimate of the default day
+    python krl_fluid.py --validate -n 100 --seed 1        # compare against the Monte Carlo mean
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from krl_batch import run_replications
+from krl_core import (
+    LAST_TRAIN_BUFFER, MAX_SIMULATION_TIME, PASSENGER_GIVE_UP_WAIT_TIME, SEATED_CAPACITY, STATIONS,
+    TRAIN_SCHEDULE, UPCOMING_TRAIN_CHECK_WINDOW, WAITING_TIME_BINS, WAITING_TIME_TICKS, ResultTables, Timetable,
+    destination_matrix, minutes_to_time_str, passenger_rate_matrix,
+)
+from krl_scenario import load_scenario
+
+VALIDATION_METRICS = ("seat_probability", "avg_waiting_time", "mean_occupancy")
+
+
+class FluidEstimate:
+    """Expected outcome of one day; get_results() has the same shape as Simulation.get_results()"""
+
+    def __init__(self, schedule=None, rates=None, destinations=None, seated_capacity=SEATED_CAPACITY, scenario=None):
+        if scenario is not None:
+            scenario.check_line()
+            schedule = schedule or scenario.schedule
+            rates = scenario.rates if rates is None else rates
+            destinations = scenario.destinations if destinations is None else destinations
+            seated_capacity = scenario.seated_capacity
+        self.schedule = sorted(schedule or TRAIN_SCHEDULE)
+        self.rates = passenger_rate_matrix() if rates is None else np.asarray(rates, dtype=np.float64)
+        self.destinations = destination_matrix() if destinations is None else np.asarray(destinations, dtype=np.float64)
+        self.seated_capacity = seated_capacity
+        self.start_time = self.schedule[0][0] - 60
+        self.service_end_time = self.schedule[-1][0] + LAST_TRAIN_BUFFER
+        self.end_time = MAX_SIMULATION_TIME
+        self.timetable = Timetable(self.schedule)
+        self.run()
+
+    def arrival_rates(self):
+        """Expected arrivals per minute x station, with the gating of Simulation.sample_arrival_stream"""
+        minutes = np.arange(0, self.end_time)
+        rates = self.rates[(minutes // 60) % 24]
+        gate = self.timetable.upcoming_mask(minutes, UPCOMING_TRAIN_CHECK_WINDOW)
+        gate &= ((minutes >= self.start_time) & (minutes <= self.service_end_time))[:, None]
+        gate &= (self.destinations.sum(axis=1) > 0)[None, :]
+        return np.where(gate, rates, 0.0)
+
+    def run(self):
+        num_trains, num_stations = len(self.schedule), len(STATIONS)
+        arrivals = self.arrival_rates()
+        waiting = arrivals.T.copy()  # station x arrival minute, expected passengers still queued
+        patience = PASSENGER_GIVE_UP_WAIT_TIME + 1  # Longest wait: boarding still happens in the tick they'd give up
+
+        tables = ResultTables.__new__(ResultTables)  # Expected counts in ResultTables' layout
+        tables.generated = arrivals.sum(axis=0)
+        tables.boarded = np.zeros((num_trains, num_stations))
+        tables.waiting_time_ticks = np.zeros((num_trains, num_stations))  # Fractional expected ticks
+        tables.waiting_time_histogram = np.zeros((num_trains, WAITING_TIME_BINS))
+        tables.completed = np.zeros((num_trains, num_stations, num_stations, 2))
+        self.occupancy_minutes = np.arange(self.start_time, self.end_time)
+        self.occupancy = np.full((num_trains, len(self.occupancy_minutes)), np.nan, dtype=np.float32)
+        self.seated = np.full_like(self.occupancy, np.nan)
+        on_board_at_end = np.zeros(2)  # [standing, seated] of trains still running at end_time
+
+        for train_id, (departure_time, capacity) in enumerate(self.schedule):
+            seated = np.zeros((num_stations, num_stations))    # origin x destination
+            standing = np.zeros((num_stations, num_stations))  # Rows in boarding order (origin order)
+            stop_ticks = self.timetable.stop_ticks[train_id].astype(np.int64)
+            for station_idx, tick in enumerate(stop_ticks):
+                if tick >= self.end_time:
+                    on_board_at_end += standing.sum(), seated.sum()
+                    break
+                if station_idx > 0:
+                    # Each seat freed at this station goes to the longest-standing passenger (boarded earliest).
+                    # One who alights here too then frees it again, so only those riding on use up seats
+                    freed = seated[:, station_idx].sum()
+                    for origin in range(station_idx):
+                        riding_on = standing[origin].sum() - standing[origin, station_idx]
+                        if freed <= 0 or not standing[origin].any():
+                            continue
+                        share = 1.0 if riding_on <= freed else freed / riding_on
+                        moved = standing[origin] * share
+                        standing[origin] -= moved
+                        seated[origin] += moved
+                        freed -= riding_on * share
+                    tables.completed[train_id, :, station_idx, 1] += seated[:, station_idx]
+                    tables.completed[train_id, :, station_idx, 0] += standing[:, station_idx]
+                    seated[:, station_idx] = 0
+                    standing[:, station_idx] = 0
+
+                # FIFO boarding from the cohorts that have not given up yet
+                first = max(0, tick - patience)
+                queue = waiting[station_idx, first:tick + 1]
+                space = max(0.0, capacity - seated.sum() - standing.sum())
+                ahead = np.cumsum(queue) - queue
+                boarding = np.clip(space - ahead, 0, queue)
+                queue -= boarding
+                wait = tick - np.arange(first, tick + 1)
+                boarded = boarding.sum()
+                tables.boarded[train_id, station_idx] = boarded
+                tables.waiting_time_ticks[train_id, station_idx] = (boarding @ wait) * WAITING_TIME_TICKS
+                np.add.at(tables.waiting_time_histogram[train_id], np.minimum(wait, WAITING_TIME_BINS - 1), boarding)
+                new_seated = min(boarded, max(0.0, self.seated_capacity - seated.sum()))
+                seated[station_idx] += new_seated * self.destinations[station_idx]
+                standing[station_idx] += (boarded - new_seated) * self.destinations[station_idx]
+
+                # Occupancy is sampled every minute until the tick of the next stop (not after the last one)
+                if station_idx + 1 < num_stations:
+                    until = min(int(stop_ticks[station_idx + 1]), self.end_time)
+                    columns = slice(tick - self.start_time, until - self.start_time)
+                    self.occupancy[train_id, columns] = (seated.sum() + standing.sum()) / capacity * 100
+                    self.seated[train_id, columns] = seated.sum() / self.seated_capacity * 100
+
+        # Whoever is still queued gives up PASSENGER_GIVE_UP_WAIT_TIME + 1 minutes after arriving, if before the end
+        gives_up = np.arange(waiting.shape[1]) + patience < self.end_time
+        tables.gave_up = waiting[:, gives_up].sum(axis=1)
+        self.tables = tables
+        self.on_board_at_end = on_board_at_end
+
+    def result_tables(self):
+        return self.tables
+
+    def get_results(self):
+        tables = self.tables
+        return {
+            "passengers_generated": float(tables.generated.sum()),
+            "passengers_completed": float(tables.completed.sum()),
+            "passengers_seated": float(self.on_board_at_end[1]),
+            "passengers_standing": float(self.on_board_at_end[0]),
+            "passengers_gave_up": float(tables.gave_up.sum()),
+            "avg_waiting_times": tables.avg_waiting_times(),
+            "seat_probability": tables.seat_probability(),
+            "seat_probability_yogya": tables.seat_probability("YK"),
+            "occupancy_minutes": self.occupancy_minutes,
+            "occupancy_data": self.occupancy,
+            "seated_percentage": self.seated,
+        }
+
+    def train_metrics(self):
+        """Per train: the metrics krl_batch reports per replication"""
+        results = self.get_results()
+        sampled = ~np.isnan(self.occupancy)
+        return {
+            train_id: {
+                "departure_time": departure_time,
+                "seat_probability": results["seat_probability"].get(train_id),
+                "avg_waiting_time": results["avg_waiting_times"].get(train_id),
+                "mean_occupancy": float(np.nanmean(self.occupancy[train_id])) if sampled[train_id].any() else None,
+            }
+            for train_id, (departure_time, _) in enumerate(self.schedule)
+        }
+
+
+def validate(n_replications=100, workers=None, seed=None, schedule=None, scenario=None):
+    """Per-train fluid estimate next to the Monte Carlo mean and 5-95% band of the tick engine"""
+    start = time.perf_counter()
+    estimate = FluidEstimate(schedule, scenario=scenario)
+    fluid_s = time.perf_counter() - start
+    start = time.perf_counter()
+    aggregate = run_replications(n_replications, workers=workers, seed=seed, schedule=schedule, scenario=scenario)
+    monte_carlo_s = time.perf_counter() - start
+
+    rows = []
+    errors = {metric: [] for metric in VALIDATION_METRICS}
+    for train_id, fluid in estimate.train_metrics().items():
+        row = {"train_id": train_id, "departure_time": fluid["departure_time"]}
+        for metric in VALIDATION_METRICS:
+            monte_carlo = aggregate["trains"].get(train_id, {}).get(metric)
+            row[metric] = {"fluid": fluid[metric], "monte_carlo": monte_carlo}
+            if fluid[metric] is not None and monte_carlo is not None:
+                errors[metric].append(abs(fluid[metric] - monte_carlo["mean"]))
+        rows.append(row)
+    results = estimate.get_results()
+    return {
+        "replications": n_replications,
+        "seed": aggregate["seed"],
+        "fluid_s": fluid_s,
+        "monte_carlo_s": monte_carlo_s,
+        "passengers_generated": {"fluid": results["passengers_generated"],
+                                 "monte_carlo": aggregate["passengers_generated"]},
+        "passengers_completed": {"fluid": results["passengers_completed"],
+                                 "monte_carlo": aggregate["passengers_completed"]},
+        "mean_absolute_error": {metric: float(np.mean(values)) if values else None for metric, values in errors.items()},
+        "trains": rows,
+    }
+
+
+def format_estimate(estimate):
+    results = estimate.get_results()
+    lines = [
+        f"Penumpang per hari (perkiraan): {results['passengers_generated']:.0f} "
+        f"(selesai {results['passengers_completed']:.0f}, menyerah {results['passengers_gave_up']:.0f})",
+        "",
+        f"{'KRL':>4} {'Berangkat':>9} {'Peluang duduk (%)':>18} {'Tunggu (menit)':>15} {'Okupansi (%)':>13}",
+    ]
+    for train_id, metrics in estimate.train_metrics().items():
+        def fmt(value, scale=1.0):
+            return "-" if value is None else f"{value * scale:.1f}"
+        lines.append(f"{train_id + 1:>4} {minutes_to_time_str(metrics['departure_time']):>9} "
+                     f"{fmt(metrics['seat_probability'], 100):>18} {fmt(metrics['avg_waiting_time']):>15} "
+                     f"{fmt(metrics['mean_occupancy']):>13}")
+    return "\n".join(lines)
+
+
+def format_validation(report):
+    def pair(values, scale=1.0):
+        fluid, monte_carlo = values["fluid"], values["monte_carlo"]
+        if fluid is None or monte_carlo is None:
+            return "-"
+        return (f"{fluid * scale:6.1f} vs {monte_carlo['mean'] * scale:6.1f} "
+                f"[{monte_carlo['p5'] * scale:.1f}-{monte_carlo['p95'] * scale:.1f}]")
+
+    errors = report["mean_absolute_error"]
+    lines = [
+        f"Fluida {report['fluid_s'] * 1e3:.1f} ms vs Monte Carlo {report['replications']} replikasi "
+        f"{report['monte_carlo_s']:.1f} s (seed {report['seed']})",
+        f"Penumpang per hari: {report['passengers_generated']['fluid']:.0f} vs "
+        f"{report['passengers_generated']['monte_carlo']['mean']:.0f}, selesai "
+        f"{report['passengers_completed']['fluid']:.0f} vs {report['passengers_completed']['monte_carlo']['mean']:.0f}",
+        "",
+        f"{'KRL':>4} {'Berangkat':>9}  {'Peluang duduk (%)':<30}{'Tunggu (menit)':<30}{'Okupansi (%)':<30}",
+    ]
+    for row in report["trains"]:
+        lines.append(f"{row['train_id'] + 1:>4} {minutes_to_time_str(row['departure_time']):>9}  "
+                     f"{pair(row['seat_probability'], 100):<30}{pair(row['avg_waiting_time']):<30}"
+                     f"{pair(row['mean_occupancy']):<30}")
+    lines.append("")
+    lines.append("Rata-rata selisih absolut: "
+                 + ", ".join(f"{metric} {'-' if value is None else f'{value:.3f}'}" for metric, value in errors.items()))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expected-value (fluid) estimate of a KRL day")
+    parser.add_argument("--scenario", metavar="PATH", help="scenario file (.json/.toml, see krl_scenario.py)")
+    parser.add_argument("--validate", action="store_true", help="compare against Monte Carlo replications")
+    parser.add_argument("-n", "--replications", type=int, default=100, help="replications for --validate")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes for --validate")
+    parser.add_argument("--seed", type=int, default=None, help="root seed for --validate")
+    parser.add_argument("--json", metavar="PATH", help="also write the result as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario) if args.scenario else None
+    if args.validate:
+        report = validate(args.replications, args.workers, args.seed, scenario=scenario)
+        text = format_validation(report)
+    else:
+        estimate = FluidEstimate(scenario=scenario)
+        report = {"results": {key: value for key, value in estimate.get_results().items()
+                              if not isinstance(value, np.ndarray)},
+                  "trains": estimate.train_metrics()}
+        text = format_estimate(estimate)
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(text)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Multi-day runs: a week (or more) of service on one simulation instance, results streamed per day.
+
+Usage:
+    python krl_multiday.py --days 7 --first-weekday 0 --holiday 2 --seed 42
+    python krl_multiday.py --days 28 --json - > days.jsonl
+"""
+import argparse
+import json
+import sys
+
+from krl_batch import summarize_replication
+from krl_core import (
+    DAY_TYPE_DEMAND, EVENT_ENGINE, ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS, TICK_ENGINE, RandomStreams, run_days,
+    week_calendar,
+)
+from krl_scenario import load_scenario
+
+DAY_NAMES = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+
+
+def summarize_day(day, day_type, simulation):
+    """Per-day totals plus the per-train summary of krl_batch"""
+    results = simulation.get_results()
+    tables = simulation.result_tables()
+    summary = summarize_replication(simulation, results)
+    summary.update({
+        "day": day,
+        "day_type": day_type,
+        "passengers_gave_up": results["passengers_gave_up"],
+        "seat_probability": tables.overall_seat_probability(),
+        "avg_waiting_time": tables.overall_avg_waiting_time(),
+    })
+    return summary
+
+
+def format_day(summary, first_weekday):
+    seat = summary["seat_probability"]
+    wait = summary["avg_waiting_time"]
+    return (f"Hari {summary['day'] + 1:>3} {DAY_NAMES[(first_weekday + summary['day']) % 7]:<7} ({summary['day_type']:<7}): "
+            f"{summary['passengers_generated']:>6} penumpang, selesai {summary['passengers_completed']:>6}, "
+            f"menyerah {summary['passengers_gave_up']:>5}, "
+            f"peluang duduk {'-' if seat is None else f'{seat * 100:.1f}%'}, "
+            f"tunggu {'-' if wait is None else f'{wait:.1f} menit'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several consecutive days of the KRL simulation")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--first-weekday", type=int, default=0, choices=range(7), help="weekday of day 1 (0 = Monday)")
+    parser.add_argument("--holiday", type=int, nargs="*", default=[], help="day numbers (1-based) that are holidays")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--engine", choices=(TICK_ENGINE, EVENT_ENGINE), default=TICK_ENGINE)
+    parser.add_argument("--arrivals", choices=(ONLINE_ARRIVALS, PRESAMPLED_ARRIVALS), default=PRESAMPLED_ARRIVALS)
+    parser.add_argument("--bounded-memory", action="store_true", help="fold finished passengers into aggregates")
+    parser.add_argument("--scenario", metavar="PATH", help="scenario file (.json/.toml, see krl_scenario.py)")
+    parser.add_argument("--json", metavar="PATH", help="write one JSON line per day ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario) if args.scenario else None
+    schedules = {day_type: scenario.schedule for day_type in DAY_TYPE_DEMAND} if scenario else None
+    calendar = week_calendar(args.days, args.first_weekday, holidays={day - 1 for day in args.holiday},
+                             schedules=schedules)
+    rng = RandomStreams(args.seed)
+    out = None
+    if args.json:
+        out = sys.stdout if args.json == "-" else open(args.json, "w")
+    try:
+        for day, day_type, simulation in run_days(calendar, engine=args.engine, arrivals=args.arrivals, rng=rng,
+                                                  bounded_memory=args.bounded_memory, scenario=scenario):
+            summary = summarize_day(day, day_type, simulation)
+            if out is not None:
+                out.write(json.dumps(summary) + "\n")
+                out.flush()
+            if args.json != "-":
+                print(format_day(summary, args.first_weekday))
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+    if args.json != "-":
+        print(f"Seed: {rng.seed}")
+
+
+if __name__ == "__main__":
+    main()
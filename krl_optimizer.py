@@ -0,0 +1,256 @@
+"""Timetable optimizer: searches departure times (TRAIN_SCHEDULE's, or a scenario's) for seat probability and waiting time.
+
+Every candidate schedule is simulated headless on the same passenger streams (common random
+numbers), candidates are evaluated in parallel worker processes and already simulated schedules
+are memoized.
+
+Usage:
+    python krl_optimizer.py --trains 15 --min-headway 30 --iterations 40 --replications 4 --seed 1
+    python krl_optimizer.py --scenario weekend.toml --seed 1   # the scenario's trains, capacities and demand
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from krl_batch import replication_seeds
+from krl_core import (
+    PRESAMPLED_ARRIVALS, TRAIN_CAPACITY, TRAIN_SCHEDULE, RandomStreams, Simulation, minutes_to_time_str,
+)
+from krl_fluid import FluidEstimate
+from krl_scenario import load_scenario
+
+# Objective weights (lower score is better): minutes of average waiting time, percentage points
+# of seat probability and percentage points of passengers giving up
+DEFAULT_WEIGHTS = {"waiting": 1.0, "seat": 1.0, "gave_up": 2.0}
+
+
+def schedule_metrics(simulation):
+    """Seat probability, average waiting time and give-up share over all passengers of a finished run"""
+    tables = simulation.result_tables()
+    generated = tables.generated.sum()
+    return {
+        "seat_probability": tables.overall_seat_probability() or 0.0,
+        "avg_waiting_time": tables.overall_avg_waiting_time() or 0.0,
+        "gave_up_share": tables.gave_up.sum() / generated if generated else 0.0,
+    }
+
+
+def score_metrics(metrics, weights):
+    return (weights["waiting"] * metrics["avg_waiting_time"]
+            - weights["seat"] * 100 * metrics["seat_probability"]
+            + weights["gave_up"] * 100 * metrics["gave_up_share"])
+
+
+def with_capacity(departures, capacity):
+    """(departure, capacity) schedule; capacity is one number for every train or one per train in departure order"""
+    capacities = [capacity] * len(departures) if np.isscalar(capacity) else capacity
+    return list(zip(departures, capacities))
+
+
+def scenario_capacity(scenario, n_trains):
+    """Capacity for n_trains trains of a scenario: its per-departure capacities if it has as many trains,
+    otherwise its most common capacity (TRAIN_CAPACITY without a scenario)"""
+    if scenario is None:
+        return TRAIN_CAPACITY
+    capacities = scenario.capacities.tolist()
+    if len(capacities) == n_trains:
+        return tuple(capacities)
+    return Counter(capacities).most_common(1)[0][0]
+
+
+def evaluate_schedule(departures, seeds, capacity=TRAIN_CAPACITY, weights=DEFAULT_WEIGHTS, scenario=None):
+    """Mean metrics and score of one schedule over the given replication seeds (demand from scenario if given)"""
+    runs = []
+    for seed in seeds:
+        simulation = Simulation(arrivals=PRESAMPLED_ARRIVALS,
+                                rng=RandomStreams(seed, common_random_numbers=True),
+                                schedule=with_capacity(departures, capacity), scenario=scenario)
+        simulation.run()
+        runs.append(schedule_metrics(simulation))
+    metrics = {key: float(np.mean([run[key] for run in runs])) for key in runs[0]}
+    metrics["score"] = float(score_metrics(metrics, weights))
+    return metrics
+
+
+def fluid_score(departures, capacity=TRAIN_CAPACITY, weights=DEFAULT_WEIGHTS, scenario=None):
+    """Score of the expected-value (fluid) estimate of a schedule: milliseconds instead of full replications"""
+    estimate = FluidEstimate(with_capacity(departures, capacity), scenario=scenario)
+    return float(score_metrics(schedule_metrics(estimate), weights))
+
+
+def repair_schedule(departures, min_headway, earliest, latest):
+    """Sorted departures within [earliest, latest] that keep at least min_headway between trains"""
+    departures = sorted(int(d) for d in departures)
+    for i in range(len(departures)):
+        lower = earliest if i == 0 else departures[i - 1] + min_headway
+        departures[i] = max(departures[i], lower)
+    for i in reversed(range(len(departures))):
+        upper = latest if i == len(departures) - 1 else departures[i + 1] - min_headway
+        departures[i] = min(departures[i], upper)
+    return tuple(departures)
+
+
+class TimetableOptimizer:
+    """Local search over departure times with a fixed number of trains and a minimum headway
+
+    n_trains, earliest, latest and capacity default to the scenario's timetable if one is given, else to
+    TRAIN_SCHEDULE and TRAIN_CAPACITY (see scenario_capacity); the search starts from that timetable.
+    A per-train capacity stays with the i-th train of the day as departures move.
+    """
+
+    def __init__(self, n_trains=None, min_headway=30, earliest=None, latest=None, replications=4, workers=None,
+                 seed=None, weights=DEFAULT_WEIGHTS, capacity=None, max_shift=30, scenario=None, prefilter=None):
+        self.base_schedule = TRAIN_SCHEDULE if scenario is None else scenario.schedule
+        n_trains = len(self.base_schedule) if n_trains is None else n_trains
+        earliest = self.base_schedule[0][0] if earliest is None else earliest
+        latest = self.base_schedule[-1][0] if latest is None else latest
+        capacity = scenario_capacity(scenario, n_trains) if capacity is None else capacity
+        if (n_trains - 1) * min_headway > latest - earliest:
+            raise ValueError(f"{n_trains} trains with a {min_headway} minute headway do not fit "
+                             f"between {minutes_to_time_str(earliest)} and {minutes_to_time_str(latest)}")
+        self.n_trains = n_trains
+        self.min_headway = min_headway
+        self.earliest = earliest
+        self.latest = latest
+        self.workers = workers or os.cpu_count() or 1
+        self.weights = weights
+        self.max_shift = max_shift  # Largest move of one departure per mutation (minutes)
+        self.seed, seeds = replication_seeds(replications + 1, seed)
+        self.replication_seeds = seeds[:replications]  # Same passenger streams for every candidate
+        self.search_rng = np.random.default_rng(seeds[-1])
+        self.evaluate = partial(evaluate_schedule, seeds=self.replication_seeds, capacity=capacity, weights=weights,
+                                scenario=scenario)
+        self.cache = {}  # departures tuple -> metrics
+        # Simulate only the `prefilter` candidates per iteration with the best fluid estimate (None: all)
+        self.prefilter = prefilter
+        self.fluid_score = partial(fluid_score, capacity=capacity, weights=weights, scenario=scenario)
+
+    def repair(self, departures):
+        return repair_schedule(departures, self.min_headway, self.earliest, self.latest)
+
+    def initial_schedule(self):
+        """The base timetable (scenario or TRAIN_SCHEDULE) if it has the requested train count, otherwise
+        evenly spaced departures"""
+        if self.n_trains == len(self.base_schedule):
+            return self.repair(departure for departure, _ in self.base_schedule)
+        return self.repair(np.linspace(self.earliest, self.latest, self.n_trains).round())
+
+    def mutate(self, departures):
+        """Shift one or two departures by up to max_shift minutes"""
+        departures = list(departures)
+        for i in self.search_rng.choice(len(departures), size=min(len(departures), self.search_rng.integers(1, 3)),
+                                        replace=False):
+            departures[i] += int(self.search_rng.integers(-self.max_shift, self.max_shift + 1))
+        return self.repair(departures)
+
+    def evaluate_all(self, candidates, pool=None):
+        """Metrics per candidate; only schedules that are not cached yet are simulated"""
+        pending = list(dict.fromkeys(c for c in candidates if c not in self.cache))
+        if pending:
+            results = pool.map(self.evaluate, pending) if pool else map(self.evaluate, pending)
+            self.cache.update(zip(pending, results))
+        return [self.cache[c] for c in candidates]
+
+    def optimize(self, iterations=40, candidates_per_iteration=8, initial=None, progress=None):
+        """(1+lambda) local search; returns (best departures, best metrics, baseline metrics)"""
+        current = self.repair(initial) if initial is not None else self.initial_schedule()
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            baseline = current_metrics = self.evaluate_all([current], pool)[0]
+            for iteration in range(iterations):
+                candidates = [self.mutate(current) for _ in range(candidates_per_iteration)]
+                if self.prefilter:
+                    candidates = sorted(candidates, key=self.fluid_score)[:self.prefilter]
+                for candidate, metrics in zip(candidates, self.evaluate_all(candidates, pool)):
+                    if metrics["score"] < current_metrics["score"]:
+                        current, current_metrics = candidate, metrics
+                if progress:
+                    progress(iteration, current, current_metrics)
+        finally:
+            if pool:
+                pool.shutdown()
+        return current, current_metrics, baseline
+
+
+def format_result(departures, metrics, baseline):
+    def describe(m):
+        return (f"peluang duduk {m['seat_probability'] * 100:.1f}%, tunggu {m['avg_waiting_time']:.1f} menit, "
+                f"menyerah {m['gave_up_share'] * 100:.1f}% (skor {m['score']:.2f})")
+
+    lines = [
+        f"Jadwal awal:   {describe(baseline)}",
+        f"Jadwal usulan: {describe(metrics)}",
+        "Keberangkatan usulan dari Yogyakarta:",
+        "  " + " ".join(minutes_to_time_str(d) for d in departures),
+    ]
+    return "\n".join(lines)
+
+
+def parse_time(value):
+    """'HH:MM' or minutes since midnight"""
+    if ":" in value:
+        hours, minutes = value.split(":")
+        return int(hours) * 60 + int(minutes)
+    return int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search departure times for better seat probability and waiting time")
+    parser.add_argument("--trains", type=int, default=None,
+                        help="number of trains per day (default: as in the scenario or TRAIN_SCHEDULE)")
+    parser.add_argument("--min-headway", type=int, default=30, help="minimum minutes between departures")
+    parser.add_argument("--earliest", type=parse_time, default=None,
+                        help="earliest departure (HH:MM, default: first departure of the scenario or TRAIN_SCHEDULE)")
+    parser.add_argument("--latest", type=parse_time, default=None,
+                        help="latest departure (HH:MM, default: last departure of the scenario or TRAIN_SCHEDULE)")
+    parser.add_argument("--iterations", type=int, default=40)
+    parser.add_argument("--candidates", type=int, default=8, help="candidate schedules per iteration")
+    parser.add_argument("--replications", type=int, default=4, help="simulated days per candidate")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=None)
+    for name, weight in DEFAULT_WEIGHTS.items():
+        parser.add_argument(f"--weight-{name.replace('_', '-')}", type=float, default=weight, dest=f"weight_{name}")
+    parser.add_argument("--scenario", metavar="PATH", help="scenario file for demand, seats, capacities and the starting timetable (see krl_scenario.py)")
+    parser.add_argument("--prefilter", type=int, default=None,
+                        help="simulate only the N candidates per iteration with the best fluid estimate")
+    parser.add_argument("--json", metavar="PATH", help="also write the result as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    optimizer = TimetableOptimizer(
+        n_trains=args.trains, min_headway=args.min_headway, earliest=args.earliest, latest=args.latest,
+        replications=args.replications, workers=args.workers, seed=args.seed,
+        weights={name: getattr(args, f"weight_{name}") for name in DEFAULT_WEIGHTS},
+        scenario=load_scenario(args.scenario) if args.scenario else None, prefilter=args.prefilter,
+    )
+
+    def progress(iteration, departures, metrics):
+        print(f"Iterasi {iteration + 1}/{args.iterations}: skor {metrics['score']:.2f} "
+              f"({len(optimizer.cache)} jadwal disimulasikan)", file=sys.stderr)
+
+    departures, metrics, baseline = optimizer.optimize(args.iterations, args.candidates, progress=progress)
+    result = {
+        "seed": optimizer.seed,
+        "departures": [minutes_to_time_str(d) for d in departures],
+        "metrics": metrics,
+        "baseline": baseline,
+        "schedules_evaluated": len(optimizer.cache),
+    }
+
+    if args.json == "-":
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_result(departures, metrics, baseline))
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Result charts of the KRL simulation, rendered with matplotlib's Agg backend to RGBA pixels.
+
+Imported lazily by the pygame app when the results are shown, so the simulation core and the
+headless tools never load matplotlib. The functions take plain data (no Simulation or pygame
+objects) and use Figure directly instead of pyplot's global state.
+"""
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from krl_core import minutes_to_time_str
+
+
+def figure_rgba(fig):
+    """(RGBA bytes, (width, height)) of a rendered figure, e.g. for pygame.image.frombuffer"""
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    return canvas.buffer_rgba().tobytes(), canvas.get_width_height()
+
+
+def bars_by_departure(ax, values, departure_times, color):
+    """Bar per train sorted by departure time; values maps train id -> value. False if there is nothing to draw"""
+    train_ids = sorted(values, key=lambda train_id: departure_times[train_id])
+    if not train_ids:
+        return False
+    x = range(len(train_ids))
+    ax.bar(x, [values[train_id] for train_id in train_ids], color=color)
+    ax.set_xticks(x)
+    ax.set_xticklabels([minutes_to_time_str(departure_times[train_id]) for train_id in train_ids], rotation=45)
+    ax.grid(True, axis='y')
+    return True
+
+
+def plot_series(ax, minutes, series, departure_times):
+    """One line per sampled train of a train x minute array, against hours since its departure"""
+    for train_id, values in enumerate(series):
+        sampled = ~np.isnan(values)
+        if sampled.sum() > 1:  # Ensure we have enough data points
+            times_adjusted = (minutes[sampled] - departure_times[train_id]) / 60  # Convert to hours since departure
+            ax.plot(times_adjusted, values[sampled],
+                    label=f"KRL {train_id} ({minutes_to_time_str(departure_times[train_id])})")
+    if len(series) > 6:
+        # If we have too many trains, make a more compact legend
+        ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), ncol=3, fontsize='small')
+    else:
+        ax.legend()
+
+
+def result_figure(results, departure_times):
+    """2x2 overview of get_results(): occupancy and seated share over time, waiting time and seat probability per train"""
+    fig = Figure(figsize=(10, 8))
+    axs = fig.subplots(2, 2)
+
+    # Plot 1: Train occupancy over time
+    ax1 = axs[0, 0]
+    plot_series(ax1, results["occupancy_minutes"], results["occupancy_data"], departure_times)
+    ax1.set_title("Okupansi Kereta Berdasarkan Waktu")
+    ax1.set_xlabel("Jam Sejak Keberangkatan")
+    ax1.set_ylabel("Okupansi (%)")
+    ax1.grid(True)
+
+    # Plot 2: Seated percentage over time
+    ax2 = axs[0, 1]
+    plot_series(ax2, results["occupancy_minutes"], results["seated_percentage"], departure_times)
+    ax2.set_title("Persentase Penumpang Duduk")
+    ax2.set_xlabel("Jam Sejak Keberangkatan")
+    ax2.set_ylabel("Kursi Terisi (%)")
+    ax2.grid(True)
+
+    # Plot 3: Average waiting times by train departure time
+    ax3 = axs[1, 0]
+    if bars_by_departure(ax3, results["avg_waiting_times"], departure_times, 'orange'):
+        ax3.set_title("Rata-rata Waktu Tunggu per Keberangkatan")
+        ax3.set_xlabel("Waktu Keberangkatan")
+        ax3.set_ylabel("Rata-rata Waktu Tunggu (menit)")
+
+    # Plot 4: Seat probability by train departure time (ALL STATIONS)
+    ax4 = axs[1, 1]
+    seat_probs = {train_id: prob * 100 for train_id, prob in results["seat_probability"].items()}  # Percentage
+    if bars_by_departure(ax4, seat_probs, departure_times, 'green'):
+        ax4.set_title("Probabilitas Mendapatkan Tempat Duduk (Semua Stasiun)")
+        ax4.set_xlabel("Waktu Keberangkatan")
+        ax4.set_ylabel("Probabilitas Kursi (%)")
+
+    fig.tight_layout()
+    return fig
+
+
+def station_figure(station_code, station_name, departure_times, seat_probability, hourly_rates, destinations, summary):
+    """2x2 analysis of one station: seat probability per train, hourly passenger rate, destinations and totals
+
+    seat_probability maps train id -> probability for passengers from this station, hourly_rates has
+    24 passengers-per-minute values, destinations maps station code -> probability and summary is
+    ResultTables.station_summary().
+    """
+    fig = Figure(figsize=(10, 8))
+    axs = fig.subplots(2, 2)
+    fig.suptitle(f"Analisis Detil Stasiun {station_name} ({station_code})", fontsize=16)
+
+    # Plot 1: Seat probability for this station
+    ax1 = axs[0, 0]
+    if not seat_probability:
+        ax1.text(0.5, 0.5, 'Tidak ada data penumpang', ha='center', va='center', transform=ax1.transAxes)
+    elif bars_by_departure(ax1, {train_id: prob * 100 for train_id, prob in seat_probability.items()},
+                           departure_times, 'green'):
+        ax1.set_xlabel("Waktu Keberangkatan")
+        ax1.set_ylabel("Probabilitas Kursi (%)")
+    else:
+        ax1.text(0.5, 0.5, 'Tidak ada data keberangkatan', ha='center', va='center', transform=ax1.transAxes)
+    ax1.set_title(f"Probabilitas Tempat Duduk dari {station_name}")
+
+    # Plot 2: Passenger generation rate by hour for this station
+    ax2 = axs[0, 1]
+    ax2.plot(range(24), hourly_rates, marker='o', linewidth=2, markersize=4, color='blue')
+    ax2.set_title(f"Rate Penumpang per Jam - {station_name}")
+    ax2.set_xlabel("Jam")
+    ax2.set_ylabel("Penumpang/Menit")
+    ax2.grid(True)
+    ax2.set_xticks(range(0, 24, 2))
+
+    # Plot 3: Destination distribution from this station
+    ax3 = axs[1, 0]
+    if destinations:
+        colors = colormaps["Set3"](range(len(destinations)))
+        ax3.pie(list(destinations.values()), labels=list(destinations), autopct='%1.1f%%', startangle=90, colors=colors)
+    else:
+        ax3.text(0.5, 0.5, 'Tidak ada tujuan\n(stasiun terakhir)', ha='center', va='center', transform=ax3.transAxes)
+    ax3.set_title(f"Distribusi Tujuan dari {station_name}")
+
+    # Plot 4: Summary statistics
+    ax4 = axs[1, 1]
+    ax4.axis('off')
+    total_generated = summary["generated"]
+    completed = summary["completed"]
+    seated = summary["seated"]
+    stats_text = [
+        f"Total Penumpang: {total_generated}",
+        f"Perjalanan Selesai: {completed}",
+        f"Mendapat Tempat Duduk: {seated}",
+        f"Tingkat Keberhasilan: {(completed/total_generated*100):.1f}%" if total_generated > 0 else "Tingkat Keberhasilan: 0%",
+        f"Rate Tempat Duduk: {(seated/completed*100):.1f}%" if completed > 0 else "Rate Tempat Duduk: 0%"
+    ]
+    for i, text in enumerate(stats_text):
+        ax4.text(0.1, 0.8 - i*0.15, text, fontsize=12, fontweight='bold', color='darkblue')
+    ax4.set_title(f"Statistik {station_name}")
+
+    fig.tight_layout()
+    return fig
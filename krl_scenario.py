@@ -0,0 +1,294 @@
+"""Scenario files: passenger rates, destinations and timetable as data instead of module constants.
+
+A scenario is a JSON or TOML file that is validated and compiled once into dense arrays (hour x
+station rates, origin x destination probabilities, departures and capacities). Compiled scenarios
+are cached by the SHA-256 of the file, in memory and optionally as .npz files in a cache directory,
+and are passed to Simulation(scenario=...) so sweeps can swap configurations without touching
+krl_core's globals.
+
+File layout (JSON shown, TOML uses the same keys; every key but "schedule" is optional):
+
+    {
+      "name": "Hari kerja 2024",
+      "stations": [["YK", 0], ["LPN", 3], ...],          (must match krl_core.STATIONS)
+      "rates": {"YK": [0.75, 0.75, ...24 hourly rates], ...},   (passengers per minute; default 0)
+      "destinations": {"YK": {"PWS": 0.45, "SLO": 0.42}, ...},  (weights, normalized per origin)
+      "train_capacity": 1600,
+      "seated_capacity": 512,
+      "schedule": ["05:05", 360, {"departure": "07:05", "capacity": 1200}, ...]
+    }
+
+Usage:
+    python krl_scenario.py --dump default.json      # write the built-in scenario as a starting point
+    python krl_scenario.py scenario.toml             # validate and summarize a scenario file
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    tomllib = None
+
+from krl_core import (
+    MAX_SIMULATION_TIME, SEATED_CAPACITY, STATIONS, TRAIN_CAPACITY, TRAIN_SCHEDULE, destination_matrix,
+    minutes_to_time_str, passenger_rate_matrix,
+)
+
+COMPILED_VERSION = 1  # Bump when the compiled arrays change meaning; older cache files are then ignored
+SCENARIO_KEYS = {"name", "stations", "rates", "destinations", "train_capacity", "seated_capacity", "schedule"}
+
+_compiled_cache = {}  # file digest -> Scenario
+
+
+class ScenarioError(ValueError):
+    """A scenario file that cannot be parsed or fails validation"""
+
+
+class Scenario:
+    """A compiled scenario: dense arrays for one line, ready for Simulation(scenario=...)"""
+
+    def __init__(self, name, station_codes, distances, rates, destinations, departures, capacities,
+                 seated_capacity, digest=None):
+        self.name = name
+        self.station_codes = list(station_codes)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.rates = np.asarray(rates, dtype=np.float64)                # hour x station, passengers per minute
+        self.destinations = np.asarray(destinations, dtype=np.float64)  # origin x destination probabilities
+        self.departures = np.asarray(departures, dtype=np.int64)        # Sorted departure minutes from the origin
+        self.capacities = np.asarray(capacities, dtype=np.int64)        # Total capacity per departure
+        self.seated_capacity = int(seated_capacity)
+        self.digest = digest  # SHA-256 of the source file, None for scenarios not loaded from a file
+        for array in (self.distances, self.rates, self.destinations, self.departures, self.capacities):
+            array.setflags(write=False)  # Shared through the cache
+
+    @property
+    def schedule(self):
+        """(departure time, capacity) per train, the form Simulation and TRAIN_SCHEDULE use"""
+        return list(zip(self.departures.tolist(), self.capacities.tolist()))
+
+    def check_line(self):
+        """Raise ScenarioError if the scenario was compiled for a different line than STATIONS"""
+        if self.station_codes != [code for code, _ in STATIONS] or not np.allclose(
+                self.distances, [distance for _, distance in STATIONS]):
+            raise ScenarioError(f"Scenario {self.name!r} is for stations {self.station_codes}, "
+                                f"the simulation runs {[code for code, _ in STATIONS]}")
+
+    def to_data(self):
+        """The scenario as a JSON-compatible dict in the file layout"""
+        return {
+            "name": self.name,
+            "stations": [[code, float(distance)] for code, distance in zip(self.station_codes, self.distances)],
+            "rates": {code: self.rates[:, idx].tolist() for idx, code in enumerate(self.station_codes)},
+            "destinations": {
+                origin: {self.station_codes[d]: float(p) for d, p in enumerate(row) if p > 0}
+                for origin, row in zip(self.station_codes, self.destinations) if row.any()
+            },
+            "seated_capacity": self.seated_capacity,
+            "schedule": [{"departure": minutes_to_time_str(d), "capacity": c} for d, c in self.schedule],
+        }
+
+    def save_npz(self, path):
+        np.savez(path, version=COMPILED_VERSION, name=self.name, station_codes=self.station_codes,
+                 distances=self.distances, rates=self.rates, destinations=self.destinations,
+                 departures=self.departures, capacities=self.capacities, seated_capacity=self.seated_capacity)
+
+    @classmethod
+    def load_npz(cls, path, digest=None):
+        """Scenario from a save_npz() file, None if it was written by another COMPILED_VERSION"""
+        with np.load(path) as data:
+            if int(data["version"]) != COMPILED_VERSION:
+                return None
+            return cls(str(data["name"]), data["station_codes"].tolist(), data["distances"], data["rates"],
+                       data["destinations"], data["departures"], data["capacities"], int(data["seated_capacity"]),
+                       digest)
+
+
+def default_scenario():
+    """The scenario built into krl_core (PASSENGER_RATES, DESTINATION_PROBS, TRAIN_SCHEDULE)"""
+    schedule = sorted(TRAIN_SCHEDULE)
+    return Scenario("bawaan", [code for code, _ in STATIONS], [distance for _, distance in STATIONS],
+                    passenger_rate_matrix(), destination_matrix(), [d for d, _ in schedule],
+                    [c for _, c in schedule], SEATED_CAPACITY)
+
+
+def parse_departure(value, where):
+    """Minutes since midnight from 'HH:MM' or a number of minutes"""
+    if isinstance(value, str):
+        try:
+            hours, minutes = value.split(":")
+            value = int(hours) * 60 + int(minutes)
+        except ValueError:
+            raise ScenarioError(f"{where}: expected 'HH:MM', got {value!r}") from None
+    elif isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ScenarioError(f"{where}: expected 'HH:MM' or whole minutes, got {value!r}")
+    if not 0 <= value < MAX_SIMULATION_TIME:
+        raise ScenarioError(f"{where}: departure {value} is outside the simulated day")
+    return int(value)
+
+
+def check_number(value, where, integer=False, positive=False):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ScenarioError(f"{where}: expected a non-negative number, got {value!r}")
+    if integer and value != int(value):
+        raise ScenarioError(f"{where}: expected a whole number, got {value!r}")
+    if positive and value <= 0:
+        raise ScenarioError(f"{where}: must be greater than zero")
+    return int(value) if integer else float(value)
+
+
+def compile_scenario(data, name=None, digest=None):
+    """Validate parsed scenario data (a dict in the file layout) and compile it into a Scenario"""
+    if not isinstance(data, dict):
+        raise ScenarioError("A scenario must be a table/object at the top level")
+    unknown = set(data) - SCENARIO_KEYS
+    if unknown:
+        raise ScenarioError(f"Unknown scenario keys: {', '.join(sorted(unknown))}")
+
+    codes = [code for code, _ in STATIONS]
+    index = {code: idx for idx, code in enumerate(codes)}
+    if "stations" in data:
+        stations = data["stations"]
+        try:
+            given = [(str(code), float(distance)) for code, distance in stations]
+        except (TypeError, ValueError):
+            raise ScenarioError("stations: expected a list of [code, distance] pairs") from None
+        if [code for code, _ in given] != codes or not np.allclose([d for _, d in given], [d for _, d in STATIONS]):
+            raise ScenarioError(f"stations: the simulated line is {STATIONS}; other lines are not supported")
+
+    rates = np.zeros((24, len(codes)))
+    for code, hourly in data.get("rates", {}).items():
+        if code not in index:
+            raise ScenarioError(f"rates: unknown station {code!r}")
+        if not isinstance(hourly, list) or len(hourly) != 24:
+            raise ScenarioError(f"rates.{code}: expected 24 hourly rates")
+        rates[:, index[code]] = [check_number(rate, f"rates.{code}[{hour}]") for hour, rate in enumerate(hourly)]
+
+    weights = np.zeros((len(codes), len(codes)))
+    for origin, destinations in data.get("destinations", {}).items():
+        if origin not in index:
+            raise ScenarioError(f"destinations: unknown station {origin!r}")
+        if not isinstance(destinations, dict):
+            raise ScenarioError(f"destinations.{origin}: expected a table of destination weights")
+        for destination, weight in destinations.items():
+            if destination not in index:
+                raise ScenarioError(f"destinations.{origin}: unknown station {destination!r}")
+            # Trains only run forward, so a passenger can only travel to a later station
+            if index[destination] <= index[origin]:
+                raise ScenarioError(f"destinations.{origin}.{destination}: destination is not after the origin")
+            weights[index[origin], index[destination]] = check_number(weight, f"destinations.{origin}.{destination}")
+    # Stations without destinations (like the terminus) generate no passengers whatever their rates
+    totals = weights.sum(axis=1, keepdims=True)
+    destinations = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
+    train_capacity = check_number(data.get("train_capacity", TRAIN_CAPACITY), "train_capacity", True, True)
+    seated_capacity = check_number(data.get("seated_capacity", SEATED_CAPACITY), "seated_capacity", True)
+    schedule = data.get("schedule")
+    if not isinstance(schedule, list) or not schedule:
+        raise ScenarioError("schedule: expected a non-empty list of departures")
+    trains = []
+    for i, entry in enumerate(schedule):
+        where = f"schedule[{i}]"
+        if isinstance(entry, dict):
+            if "departure" not in entry or set(entry) - {"departure", "capacity"}:
+                raise ScenarioError(f"{where}: expected keys 'departure' and optionally 'capacity'")
+            departure = parse_departure(entry["departure"], where)
+            capacity = check_number(entry.get("capacity", train_capacity), f"{where}.capacity", True, True)
+        else:
+            departure, capacity = parse_departure(entry, where), train_capacity
+        if capacity < seated_capacity:
+            raise ScenarioError(f"{where}: capacity {capacity} is below the seated capacity {seated_capacity}")
+        trains.append((departure, capacity))
+    trains.sort()
+
+    name = data.get("name", name)
+    return Scenario(str(name) if name is not None else None, codes, [d for _, d in STATIONS], rates, destinations,
+                    [d for d, _ in trains], [c for _, c in trains], seated_capacity, digest)
+
+
+def parse_scenario_file(path, content):
+    """Parsed data of a .json or .toml scenario file"""
+    try:
+        if str(path).endswith(".toml"):
+            if tomllib is None:
+                raise ScenarioError("TOML scenarios need Python 3.11+ (tomllib); use JSON instead")
+            return tomllib.loads(content.decode("utf-8"))
+        return json.loads(content)
+    except (ValueError, UnicodeDecodeError) as error:  # JSONDecodeError and TOMLDecodeError are ValueErrors
+        raise ScenarioError(str(error)) from None
+
+
+def load_scenario(path, cache_dir=None):
+    """Compiled scenario of a JSON/TOML file, cached by the SHA-256 of its content
+
+    The cache lives in this process and, with cache_dir, also in <digest>.npz files there so other
+    processes (e.g. krl_batch workers) skip the parsing and validation.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    scenario = _compiled_cache.get(digest)
+    if scenario is not None:
+        return scenario
+    cache_path = os.path.join(cache_dir, f"{digest}.npz") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        scenario = Scenario.load_npz(cache_path, digest)
+    if scenario is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            scenario = compile_scenario(parse_scenario_file(path, content), name, digest)
+        except ScenarioError as error:
+            raise ScenarioError(f"{path}: {error}") from None
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            scenario.save_npz(cache_path)
+    _compiled_cache[digest] = scenario
+    return scenario
+
+
+def format_scenario(scenario):
+    """Short human readable description of a compiled scenario"""
+    daily = scenario.rates.sum(axis=0) * 60  # Passengers per day if every hour were served
+    lines = [
+        f"Skenario: {scenario.name} ({len(scenario.departures)} kereta, kursi {scenario.seated_capacity}"
+        f"{', sha256 ' + scenario.digest[:12] if scenario.digest else ''})",
+        "Keberangkatan: " + " ".join(minutes_to_time_str(d) for d in scenario.departures.tolist()),
+        "Permintaan per hari: " + ", ".join(f"{code} {count:.0f}" for code, count in zip(scenario.station_codes, daily)),
+    ]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate KRL scenario files or dump the built-in scenario")
+    parser.add_argument("scenario", nargs="?", help="scenario file (.json or .toml) to validate")
+    parser.add_argument("--dump", metavar="PATH", help="write the built-in scenario as JSON ('-' for stdout)")
+    parser.add_argument("--cache-dir", metavar="DIR", help="keep compiled scenarios as .npz files here")
+    args = parser.parse_args(argv)
+    if not args.scenario and not args.dump:
+        parser.error("give a scenario file or --dump")
+
+    if args.dump:
+        data = default_scenario().to_data()
+        if args.dump == "-":
+            json.dump(data, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.dump, "w") as f:
+                json.dump(data, f, indent=2)
+    if args.scenario:
+        try:
+            scenario = load_scenario(args.scenario, args.cache_dir)
+        except ScenarioError as error:
+            print(f"Skenario tidak valid: {error}", file=sys.stderr)
+            sys.exit(1)
+        print(format_scenario(scenario))
+
+
+if __name__ == "__main__":
+    main()